@@ -0,0 +1,328 @@
+"""
+Headless Minesweeper self-play benchmark
+
+Plays many games of Minesweeper against MinesweeperAI without pygame and
+reports win rate, moves per second, add_knowledge latency and the size of
+the knowledge base over the course of a game.
+
+With --check, every move is also replayed into ReferenceAI, which makes
+inferences with the original loop over all pairs of sentences. Games are
+reported where MinesweeperAI misses a safe or mine that ReferenceAI found,
+or marks a cell wrongly, and counted where it found more.
+
+Usage: python benchmark.py [--level LEVEL] [--games N] [--seed S]
+                           [--processes P] [--solver SOLVER] [--board BOARD]
+                           [--flood] [--check]
+                           [--height H --width W --mines M]
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import ArrayMinesweeper, Minesweeper, MinesweeperAI
+
+# (height, width, mines) of the standard difficulty levels
+LEVELS = {
+    "beginner": (9, 9, 10),
+    "intermediate": (16, 16, 40),
+    "expert": (16, 30, 99),
+}
+
+# move numbers at which the knowledge base size is reported
+CHECKPOINTS = [1, 10, 25, 50, 100, 200, 400]
+
+
+class ReferenceAI():
+    """
+    Minesweeper AI making inferences as the original MinesweeperAI did:
+    sentences are sets of cells in a list, and the whole list is scanned
+    again from the top after every change, so its safes and mines are the
+    ones the faster MinesweeperAI must reproduce.
+    """
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.moves_made = set()
+        self.mines = set()
+        self.safes = set()
+
+        # list of [cells, count] sentences
+        self.knowledge = []
+
+    def mark_mine(self, cell):
+        self.mines.add(cell)
+        for sentence in self.knowledge:
+            if cell in sentence[0]:
+                sentence[0].remove(cell)
+                sentence[1] -= 1
+
+    def mark_safe(self, cell):
+        self.safes.add(cell)
+        for sentence in self.knowledge:
+            sentence[0].discard(cell)
+
+    def add_knowledge(self, cell, count):
+        self.moves_made.add(cell)
+        self.mark_safe(cell)
+
+        # neighbors not known yet, and the count of mines among them
+        neighbors = set()
+        for i in range(cell[0] - 1, cell[0] + 2):
+            for j in range(cell[1] - 1, cell[1] + 2):
+                if (i, j) in self.moves_made or (i, j) in self.safes:
+                    continue
+                if (i, j) in self.mines:
+                    count -= 1
+                elif 0 <= i < self.height and 0 <= j < self.width:
+                    neighbors.add((i, j))
+        if neighbors:
+            self.knowledge.append([neighbors, count])
+
+        changed = True
+        while changed:
+            changed = False
+
+            # sentences are only changed right before the scan restarts,
+            # so a shallow copy sees them as they were when it started
+            for sentence in list(self.knowledge):
+                cells, count = sentence
+                if not cells:
+                    self.knowledge.remove(sentence)
+                    continue
+
+                if len(cells) == count or count == 0:
+                    self.knowledge.remove(sentence)
+                    for other in set(cells):
+                        if count:
+                            self.mark_mine(other)
+                        else:
+                            self.mark_safe(other)
+                    changed = True
+                    break
+
+                # replace sentence by its difference with every subset;
+                # unlike the original, skip differences already known, as
+                # repeated copies made it blow up on large boards
+                for otherCells, otherCount in list(self.knowledge):
+                    if otherCells and otherCells != cells \
+                            and otherCells <= cells:
+                        difference = [cells - otherCells, count - otherCount]
+                        if difference not in self.knowledge:
+                            self.knowledge.append(difference)
+                        changed = True
+                if changed:
+                    self.knowledge.remove(sentence)
+                    break
+
+
+# game representations that can be benchmarked
+BOARDS = {
+    "list": Minesweeper,
+    "array": ArrayMinesweeper,
+}
+
+
+def play_game(height, width, mines, seed, solver, board="list", flood=False,
+              check=False):
+    """
+    Play one seeded game and return its statistics: whether it was won,
+    the number of moves, the time spent, the add_knowledge latency of each
+    move and the knowledge base size after each move.
+    If `flood` is True, each move reveals its whole area with no nearby
+    mines, which is added with a single add_knowledge_batch call.
+    If `check` is True, the statistics also hold the first move after
+    which MinesweeperAI missed an inference of ReferenceAI, and the first
+    move after which it marked a mine safe or a safe cell as a mine (or
+    None), and whether it ever knew more than ReferenceAI.
+    """
+    random.seed(seed)
+    game = BOARDS[board](height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, total_mines=mines)
+    reference = ReferenceAI(height, width) if check else None
+    missed = None
+    wrong = None
+    ahead = False
+
+    latencies = []
+    sizes = []
+    lost = False
+    start = time.perf_counter()
+    while True:
+        move = ai.make_safe_move()
+        if move is None:
+            if solver == "probable":
+                move = ai.make_probable_move()
+            else:
+                move = ai.make_random_move()
+        if move is None:
+            break
+        if game.is_mine(move):
+            lost = True
+            break
+
+        if flood:
+            counts = game.reveal(move, ai.moves_made)
+            moveStart = time.perf_counter()
+            ai.add_knowledge_batch(counts)
+        else:
+            nearby = game.nearby_mines(move)
+            moveStart = time.perf_counter()
+            ai.add_knowledge(move, nearby)
+        latencies.append(time.perf_counter() - moveStart)
+        sizes.append(len(ai.knowledge))
+
+        if reference is not None and missed is None:
+            revealed = counts if flood else {move: nearby}
+            for cell, count in revealed.items():
+                reference.add_knowledge(cell, count)
+            if reference.safes - ai.safes or reference.mines - ai.mines:
+                missed = len(latencies)
+            ahead = ahead or ai.safes - reference.safes \
+                or ai.mines - reference.mines
+        if check and wrong is None:
+            if ai.safes & game.mines or ai.mines - game.mines:
+                wrong = len(latencies)
+
+    return {
+        "won": not lost and ai.mines == game.mines,
+        "moves": len(latencies),
+        "seconds": time.perf_counter() - start,
+        "latencies": latencies,
+        "sizes": sizes,
+        "seed": seed,
+        "missed": missed,
+        "wrong": wrong,
+        "ahead": bool(ahead),
+    }
+
+
+def play_games(args):
+    """
+    Play a batch of games in a worker process.
+    """
+    height, width, mines, seeds, solver, board, flood, check = args
+    return [
+        play_game(height, width, mines, seed, solver, board, flood, check)
+        for seed in seeds
+    ]
+
+
+def percentile(values, fraction):
+    """
+    Returns the value at the given fraction of the sorted values.
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(height, width, mines, games, seed=0, processes=1, solver="probable",
+        board="list", flood=False, check=False):
+    """
+    Play `games` games, split over `processes` processes, and return the
+    statistics of every game.
+    """
+    seeds = list(range(seed, seed + games))
+    if processes <= 1:
+        return play_games(
+            (height, width, mines, seeds, solver, board, flood, check)
+        )
+
+    batches = [
+        (height, width, mines, seeds[k::processes], solver, board, flood,
+         check)
+        for k in range(processes)
+    ]
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for batch in executor.map(play_games, batches):
+            results.extend(batch)
+    return results
+
+
+def report(results):
+    """
+    Print summary statistics of a list of game results.
+    """
+    games = len(results)
+    wins = sum(result["won"] for result in results)
+    moves = sum(result["moves"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    latencies = [t for result in results for t in result["latencies"]]
+
+    print(f"Games:           {games}")
+    print(f"Win rate:        {wins / games:.1%}")
+    print(f"Moves/second:    {moves / seconds if seconds else 0:.0f}")
+    print(f"add_knowledge:   p50 {percentile(latencies, 0.5) * 1e6:.0f} us, "
+          f"p99 {percentile(latencies, 0.99) * 1e6:.0f} us")
+
+    print("Knowledge base size by move:")
+    for checkpoint in CHECKPOINTS:
+        sizes = [
+            result["sizes"][checkpoint - 1] for result in results
+            if len(result["sizes"]) >= checkpoint
+        ]
+        if sizes:
+            mean = sum(sizes) / len(sizes)
+            print(f"  move {checkpoint:>4}: mean {mean:.1f}, "
+                  f"max {max(sizes)} ({len(sizes)} games)")
+
+
+def report_check(results):
+    """
+    Print the games where MinesweeperAI missed an inference ReferenceAI
+    made or marked a cell wrongly, and count those where it knew more.
+    """
+    ahead = sum(result["ahead"] for result in results)
+    print(f"Reference check ({len(results)} games): "
+          f"{ahead} games with inferences ReferenceAI missed")
+    for key, problem in (("missed", "missed an inference of ReferenceAI"),
+                         ("wrong", "marked a cell wrongly")):
+        for result in results:
+            if result[key] is not None:
+                print(f"  seed {result['seed']}: {problem} "
+                      f"after move {result[key]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--level", choices=list(LEVELS) + ["custom"],
+                        default="beginner")
+    parser.add_argument("--height", type=int)
+    parser.add_argument("--width", type=int)
+    parser.add_argument("--mines", type=int)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--solver", choices=["probable", "random"],
+                        default="probable")
+    parser.add_argument("--board", choices=list(BOARDS), default="list")
+    parser.add_argument("--flood", action="store_true",
+                        help="reveal areas with no nearby mines at once")
+    parser.add_argument("--check", action="store_true",
+                        help="compare inferences with ReferenceAI")
+    args = parser.parse_args()
+
+    if args.level == "custom":
+        if None in (args.height, args.width, args.mines):
+            parser.error("custom level needs --height, --width and --mines")
+        height, width, mines = args.height, args.width, args.mines
+    else:
+        height, width, mines = LEVELS[args.level]
+
+    print(f"{args.level}: {height}x{width}, {mines} mines, "
+          f"{args.solver} solver, {args.board} board, seed {args.seed}")
+    results = run(height, width, mines, args.games, args.seed,
+                  args.processes, args.solver, args.board, args.flood,
+                  args.check)
+    report(results)
+    if args.check:
+        report_check(results)
+
+
+if __name__ == "__main__":
+    main()
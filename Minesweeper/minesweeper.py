@@ -1,6 +1,17 @@
 import itertools
+import math
 import random
-import copy
+import time
+from collections import deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# largest number of frontier cells in one component whose mine
+# configurations are enumerated exactly
+MAX_COMPONENT_CELLS = 24
 
 
 class Minesweeper():
@@ -78,6 +89,32 @@ class Minesweeper():
 
         return count
 
+    def reveal(self, cell, revealed=()):
+        """
+        Reveals a safe cell and, if it has no nearby mines, flood fills
+        outwards through every connected cell with no nearby mines.
+        Returns a dictionary mapping each revealed cell to its number of
+        nearby mines. Cells in `revealed` are treated as already revealed
+        and not returned again.
+        """
+        counts = {cell: self.nearby_mines(cell)}
+        queue = deque([cell])
+
+        # breadth-first search through cells with no nearby mines,
+        # revealing all of their neighbors
+        while queue:
+            i, j = queue.popleft()
+            if counts[i, j] != 0:
+                continue
+            for ni in range(max(i - 1, 0), min(i + 2, self.height)):
+                for nj in range(max(j - 1, 0), min(j + 2, self.width)):
+                    if (ni, nj) in counts or (ni, nj) in revealed:
+                        continue
+                    counts[ni, nj] = self.nearby_mines((ni, nj))
+                    queue.append((ni, nj))
+
+        return counts
+
     def won(self):
         """
         Checks if all mines have been flagged.
@@ -85,20 +122,116 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+class ArrayMinesweeper(Minesweeper):
+    """
+    Minesweeper game representation backed by NumPy arrays, for large
+    boards. Mines are placed in a single draw, and the number of nearby
+    mines of every cell is computed once, so nearby_mines is a lookup.
+    """
+
+    def __init__(self, height=8, width=8, mines=8, seed=None):
+        if numpy is None:
+            raise ImportError("ArrayMinesweeper requires numpy")
+
+        # Set initial width, height
+        self.height = height
+        self.width = width
+
+        # Draw seed from `random` by default, so random.seed also
+        # makes these boards reproducible
+        if seed is None:
+            seed = random.getrandbits(64)
+        rng = numpy.random.default_rng(seed)
+
+        # Place all mines at once, on distinct cells
+        positions = rng.choice(height * width, size=mines, replace=False)
+        self.board = numpy.zeros((height, width), dtype=bool)
+        self.board.flat[positions] = True
+        self.mines = set(
+            (int(i), int(j)) for i, j in zip(*numpy.divmod(positions, width))
+        )
+
+        # Count mines around each cell by summing the 8 shifted copies
+        # of the padded board (a 3 x 3 convolution)
+        padded = numpy.pad(self.board.astype(numpy.uint8), 1)
+        self.counts = numpy.zeros((height, width), dtype=numpy.uint8)
+        for di in range(3):
+            for dj in range(3):
+                if (di, dj) != (1, 1):
+                    self.counts += padded[di:di + height, dj:dj + width]
+
+        # At first, player has found no mines
+        self.mines_found = set()
+
+    def is_mine(self, cell):
+        return bool(self.board[cell])
+
+    def nearby_mines(self, cell):
+        """
+        Returns the number of mines that are
+        within one row and column of a given cell,
+        not including the cell itself.
+        """
+        return int(self.counts[cell])
+
+
+def bit_indices(mask):
+    """
+    Returns the indices of the bits set in an integer bitmask.
+    """
+    indices = []
+    while mask:
+        bit = mask & -mask
+        indices.append(bit.bit_length() - 1)
+        mask ^= bit
+    return indices
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    Sentences hash by the integer bitmask of their cells, where
+    cell (i, j) is bit i * width + j.
     """
 
-    def __init__(self, cells, count):
+    __slots__ = ("cells", "count", "width")
+
+    def __init__(self, cells, count, width):
         self.cells = set(cells)
         self.count = count
+        self.width = width
+
+    @classmethod
+    def from_mask(cls, mask, count, width):
+        """
+        Creates a sentence from a bitmask of cells.
+        """
+        return cls((divmod(k, width) for k in bit_indices(mask)), count, width)
+
+    @property
+    def mask(self):
+        """
+        Returns the integer bitmask of the cells in the sentence.
+        """
+        mask = 0
+        for i, j in self.cells:
+            # a column past the width would alias a cell of the next row
+            if not 0 <= j < self.width:
+                raise ValueError(
+                    f"cell {(i, j)} outside board width {self.width}"
+                )
+            mask |= 1 << (i * self.width + j)
+        return mask
 
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        return hash((self.mask, self.count))
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
@@ -162,12 +295,19 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, total_mines=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Number of mines on the board, if known
+        self.total_mines = total_mines
+
+        # Mine configuration counts of frontier components,
+        # keyed by the sentences in the component
+        self.componentCache = dict()
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -175,8 +315,29 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Safe cells not played yet, in the order they were found;
+        # cells played since they were queued are skipped lazily
+        self.unplayedSafes = deque()
+
+        # Cells neither played nor known to be mines, in a list for random
+        # sampling, with the position of each cell for constant time removal
+        self.unknownCells = [
+            (i, j) for i in range(height) for j in range(width)
+        ]
+        self.unknownPosition = {
+            cell: k for k, cell in enumerate(self.unknownCells)
+        }
+
+        # Sentences about the game known to be true, keyed by their id
+        # so that they can be removed in constant time
+        self.knowledge = dict()
+
+        # For each cell, the sentences containing it (keyed by their id)
+        self.cellIndex = dict()
+
+        # Sentences added or changed since they were last checked
+        # for new inferences
+        self.pending = deque()
 
     def mark_mine(self, cell):
         """
@@ -184,17 +345,122 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        self.remove_unknown(cell)
+
+        # only update sentences containing the cell,
+        # which will not contain it any more
+        touched = self.cellIndex.pop(cell, {})
+        for sentence in touched.values():
             sentence.mark_mine(cell)
+            self.update_sentence(sentence)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        # no sentence contains a cell already known to be safe
+        if cell in self.safes:
+            return
+        if cell not in self.moves_made:
+            self.unplayedSafes.append(cell)
         self.safes.add(cell)
-        for sentence in self.knowledge:
+
+        # only update sentences containing the cell,
+        # which will not contain it any more
+        touched = self.cellIndex.pop(cell, {})
+        for sentence in touched.values():
             sentence.mark_safe(cell)
+            self.update_sentence(sentence)
+
+    def remove_unknown(self, cell):
+        """
+        Removes a cell from the unknown cells, by moving the last unknown
+        cell into its position.
+        """
+        k = self.unknownPosition.pop(cell, None)
+        if k is None:
+            return
+        last = self.unknownCells.pop()
+        if last != cell:
+            self.unknownCells[k] = last
+            self.unknownPosition[last] = k
+
+    def add_sentence(self, cells, count):
+        """
+        Adds a sentence to the knowledge base, unless it is empty
+        or already known, and queues it to be checked for inferences.
+        """
+        if not cells:
+            return
+
+        # any sentence with the same cells contains the first cell
+        for sentence in self.cellIndex.get(next(iter(cells)), {}).values():
+            if sentence.cells == cells:
+                return
+
+        sentence = Sentence(cells, count, self.width)
+        self.knowledge[id(sentence)] = sentence
+        for cell in cells:
+            self.cellIndex.setdefault(cell, dict())[id(sentence)] = sentence
+        self.pending.append(sentence)
+
+    def update_sentence(self, sentence):
+        """
+        Queues a sentence that lost a cell to be checked again,
+        or drops it from the knowledge base if it has no cells left.
+        """
+        if sentence.cells:
+            self.pending.append(sentence)
+        else:
+            del self.knowledge[id(sentence)]
+
+    def infer(self):
+        """
+        Marks cells as safe or as mines, and adds new sentences, until no
+        more inferences can be made. Only sentences added or changed since
+        the last call are checked, and each is only compared with the
+        sentences it shares a cell with.
+        """
+        while self.pending:
+            sentence = self.pending.popleft()
+
+            # skip sentences removed since they were queued
+            # (a queued sentence stays alive, so its id is not reused)
+            if id(sentence) not in self.knowledge:
+                continue
+
+            # if sentence only contains mines or only safes, mark them;
+            # this empties the sentence and queues every sentence touched
+            sentence_mines = sentence.known_mines()
+            if sentence_mines:
+                for cell in list(sentence_mines):
+                    self.mark_mine(cell)
+                continue
+
+            sentence_safes = sentence.known_safes()
+            if sentence_safes:
+                for cell in list(sentence_safes):
+                    self.mark_safe(cell)
+                continue
+
+            # collect other sentences sharing at least one cell
+            overlapping = dict()
+            for cell in sentence.cells:
+                overlapping.update(self.cellIndex[cell])
+            del overlapping[id(sentence)]
+
+            # if one sentence is a subset of the other, add the difference
+            # of the two; the larger sentence is kept, as later sentences
+            # may be subsets of it too, so the inferences made do not
+            # depend on the order sentences are checked in
+            for other in overlapping.values():
+                if other.cells < sentence.cells:
+                    self.add_sentence(sentence.cells - other.cells,
+                                      sentence.count - other.count)
+                elif sentence.cells < other.cells:
+                    self.add_sentence(other.cells - sentence.cells,
+                                      other.count - sentence.count)
 
     def add_knowledge(self, cell, count):
         """
@@ -214,8 +480,41 @@ class MinesweeperAI():
 
         # mark the move and mark cell as safe
         self.moves_made.add(cell)
+        self.remove_unknown(cell)
         self.mark_safe(cell)
 
+        # add new sentence, then make all inferences it leads to
+        self.add_neighbor_sentence(cell, count)
+        self.infer()
+
+        return
+        raise NotImplementedError
+
+    def add_knowledge_batch(self, counts):
+        """
+        Called with a dictionary mapping safe cells to their number of
+        neighboring mines, e.g. all cells revealed by Minesweeper.reveal.
+        Adds the same knowledge as calling add_knowledge on each cell,
+        but makes inferences only once all cells are added.
+        """
+
+        # mark all moves and cells as safe first, so new sentences
+        # leave out every revealed cell
+        for cell in counts:
+            self.moves_made.add(cell)
+            self.remove_unknown(cell)
+            self.mark_safe(cell)
+
+        for cell, count in counts.items():
+            self.add_neighbor_sentence(cell, count)
+        self.infer()
+
+    def add_neighbor_sentence(self, cell, count):
+        """
+        Adds the sentence that `count` of the neighbors of a safe cell
+        are mines, leaving out neighbors already known.
+        """
+
         # initialize neighbors set and count of known mine in set
         neighbors = set()
         neighborMine = 0
@@ -224,8 +523,8 @@ class MinesweeperAI():
         # if not already made, safes, or mines
         for i in range(cell[0] - 1, cell[0] + 2):
             for j in range(cell[1] - 1, cell[1] + 2):
-                # don't add cell if in moves_made or marked as safe
-                if (i, j) in self.moves_made or (i, j) in self.safes:
+                # don't add cell if marked as safe (every move made is)
+                if (i, j) in self.safes:
                     continue
 
                 # don't add cell if is known mine
@@ -237,75 +536,8 @@ class MinesweeperAI():
                 if 0 <= i < self.height and 0 <= j < self.width:
                     neighbors.add((i, j))
 
-        # if neighbors set is not empty, add new sentence
-        # (subtracting mine count from total count)
-        if neighbors != set():
-            self.knowledge.append(Sentence(neighbors, count - neighborMine))
-
-        newInterference = True
-        # run while loop until no new interference can be made
-        while newInterference:
-            # initialize bool variable for new interferences
-            newInterference = False
-            # make deep copy for iterations
-            knowledgeCopy = copy.deepcopy(self.knowledge)
-
-            # loop through sentences in knowledge base to make interferences
-            for sentence in knowledgeCopy:
-                # if sentence is empty, remove from KB and go to next sentence
-                if sentence.cells == set():
-                    self.knowledge.remove(sentence)
-                    continue
-
-                # if sentence only contains mines, remove sentences, update KB
-                # then loop through KB from the top
-                sentence_mines = copy.deepcopy(sentence.known_mines())
-                if sentence_mines != set():
-                    self.knowledge.remove(sentence)
-                    for cell in sentence_mines:
-                        self.mark_mine(cell)
-                    newInterference = True
-                    break
-
-                # if sentence only contains safes, remove sentences, update KB
-                # then loop through KB from the top
-                sentence_safes = copy.deepcopy(sentence.known_safes())
-                if sentence_safes != set():
-                    self.knowledge.remove(sentence)
-                    for cell in sentence_safes:
-                        self.mark_safe(cell)
-                    newInterference = True
-                    break
-
-                # loop through KB to add all new sentences inferred
-                for sentence2 in knowledgeCopy:
-                    parentCells = sentence.cells
-                    childCells = sentence2.cells
-
-                    # skip same sentence
-                    if parentCells == childCells:
-                        continue
-
-                    # skip empty sentences
-                    if childCells == set():
-                        continue
-
-                    # check if sentence2 cells is subset
-                    if childCells.issubset(parentCells):
-                        # subtract cells, then add new sentence to KB
-                        subsetCells = parentCells.difference(childCells)
-                        subsetCount = sentence.count - sentence2.count
-                        self.knowledge.append(Sentence(subsetCells, subsetCount))
-                        newInterference = True
-
-                # if any new interferences made from subset logic,
-                # remove parent sentence then loop through KB from the top
-                if newInterference:
-                    self.knowledge.remove(sentence)
-                    break
-
-        return
-        raise NotImplementedError
+        # add new sentence (subtracting mine count from total count)
+        self.add_sentence(neighbors, count - neighborMine)
 
     def make_safe_move(self):
         """
@@ -317,10 +549,11 @@ class MinesweeperAI():
         and self.moves_made, but should not modify any of those values.
         """
 
-        # loop through moves in safes, if not already made then return move
-        for move in self.safes:
-            if move not in self.moves_made:
-                return move
+        # drop queued safes played since, then return the oldest one left
+        while self.unplayedSafes and self.unplayedSafes[0] in self.moves_made:
+            self.unplayedSafes.popleft()
+        if self.unplayedSafes:
+            return self.unplayedSafes[0]
         return None
 
         raise NotImplementedError
@@ -333,21 +566,263 @@ class MinesweeperAI():
             2) are not known to be mines
         """
 
-        # calculate total number of possible moves
-        possibleMoves = self.height * self.width
-
         # if there are no moves left without touching mine
-        if len(self.moves_made) + len(self.mines) == possibleMoves:
+        if not self.unknownCells:
             return None
         else:
-            # initialize list of possible moves
-            possibleList = list()
-            for i in range(self.height):
-                for j in range(self.width):
-                    # add possible move if not already made or a known mine
-                    if (i, j) not in self.moves_made \
-                            and (i, j) not in self.mines:
-                        possibleList.append((i, j))
-            return random.choice(possibleList)
+            # unknown cells are kept up to date as moves and mines are added
+            return random.choice(self.unknownCells)
 
         raise NotImplementedError
+
+    def frontier_components(self):
+        """
+        Splits the knowledge base into independent components: groups of
+        sentences linked by shared cells. Returns a list of
+        (cells, sentences) pairs, where cells are listed in the order
+        they are reached from the first sentence.
+        """
+        components = []
+        visited = set()
+        for start in self.knowledge.values():
+            if id(start) in visited:
+                continue
+
+            # breadth-first search through sentences sharing a cell
+            visited.add(id(start))
+            queue = deque([start])
+            cells = []
+            seenCells = set()
+            sentences = []
+            while queue:
+                sentence = queue.popleft()
+                sentences.append(sentence)
+                for cell in sentence.cells:
+                    if cell in seenCells:
+                        continue
+                    seenCells.add(cell)
+                    cells.append(cell)
+                    for other in self.cellIndex[cell].values():
+                        if id(other) not in visited:
+                            visited.add(id(other))
+                            queue.append(other)
+            components.append((cells, sentences))
+        return components
+
+    def count_configurations(self, cells, sentences, deadline):
+        """
+        Counts the mine configurations of a component consistent with all
+        of its sentences. Returns (counts, cellCounts), where counts[m] is
+        the number of configurations with m mines and cellCounts[m][cell]
+        the number of those with a mine in that cell.
+        Raises TimeoutError once `deadline` (a time.perf_counter value)
+        has passed.
+        """
+        key = frozenset(
+            (sentence.mask, sentence.count) for sentence in sentences
+        )
+        if key in self.componentCache:
+            return self.componentCache[key]
+
+        # for each cell, the sentences it appears in
+        position = {cell: c for c, cell in enumerate(cells)}
+        cellSentences = [[] for _ in cells]
+        remaining = []
+        unassigned = []
+        for index, sentence in enumerate(sentences):
+            for cell in sentence.cells:
+                cellSentences[position[cell]].append(index)
+            remaining.append(sentence.count)
+            unassigned.append(len(sentence.cells))
+
+        counts = [0] * (len(cells) + 1)
+        cellCounts = [[0] * len(cells) for _ in range(len(cells) + 1)]
+        assignment = [0] * len(cells)
+
+        def assign(c, mines):
+            if time.perf_counter() > deadline:
+                raise TimeoutError
+
+            # every cell assigned, record configuration
+            if c == len(cells):
+                counts[mines] += 1
+                for d in range(len(cells)):
+                    cellCounts[mines][d] += assignment[d]
+                return
+
+            for value in (0, 1):
+                # update sentences containing the cell, and only go on if
+                # each can still reach its count with the cells left
+                consistent = True
+                for index in cellSentences[c]:
+                    unassigned[index] -= 1
+                    remaining[index] -= value
+                    if not 0 <= remaining[index] <= unassigned[index]:
+                        consistent = False
+                if consistent:
+                    assignment[c] = value
+                    assign(c + 1, mines + value)
+                for index in cellSentences[c]:
+                    unassigned[index] += 1
+                    remaining[index] += value
+            assignment[c] = 0
+
+        assign(0, 0)
+
+        # key the counts by cell, as the cells of the same sentences can be
+        # listed in another order the next time
+        cellCounts = [dict(zip(cells, row)) for row in cellCounts]
+
+        # keep cache from growing without bound over a long game
+        if len(self.componentCache) > 1024:
+            self.componentCache.clear()
+        self.componentCache[key] = (counts, cellCounts)
+        return counts, cellCounts
+
+    def mine_probabilities(self, time_limit=0.1):
+        """
+        Returns a dictionary mapping each frontier cell (a cell in some
+        sentence) to its probability of being a mine, and the probability
+        for every other unknown cell.
+
+        Mine configurations are counted exactly per component and weighted
+        by the number of ways to place the remaining mines elsewhere.
+        Components too large to count, or not counted before the time limit
+        runs out, get estimates from single sentences, and their cells are
+        treated like cells off the frontier when weighting the others.
+        If the mine total is unknown, every component is estimated.
+        """
+        deadline = time.perf_counter() + time_limit
+        components = self.frontier_components()
+
+        unknown = self.height * self.width - len(self.moves_made) \
+            - len(self.mines) - len(self.safes - self.moves_made)
+        minesLeft = None
+        if self.total_mines is not None:
+            minesLeft = self.total_mines - len(self.mines)
+        if minesLeft is None:
+            return self.estimate_probabilities(components, minesLeft, unknown)
+
+        # count each component exactly if it is small enough and there is
+        # time left, otherwise estimate it
+        exact = []
+        counted = []
+        estimated = []
+        for cells, sentences in components:
+            if len(cells) <= MAX_COMPONENT_CELLS:
+                try:
+                    counted.append(
+                        self.count_configurations(cells, sentences, deadline)
+                    )
+                    exact.append((cells, sentences))
+                    continue
+                except TimeoutError:
+                    pass
+            estimated.append((cells, sentences))
+        outside = unknown - sum(len(cells) for cells, _ in exact)
+
+        def weight(m):
+            # ways to place the mines not on the frontier outside of it
+            if 0 <= minesLeft - m <= outside:
+                return math.comb(outside, minesLeft - m)
+            return 0
+
+        def convolve(first, second):
+            total = [0] * (len(first) + len(second) - 1)
+            for m, ways in enumerate(first):
+                if ways:
+                    for n, otherWays in enumerate(second):
+                        total[m + n] += ways * otherWays
+            return total
+
+        # number of configurations of all components by mine count
+        everything = [1]
+        for counts, _ in counted:
+            everything = convolve(everything, counts)
+        norm = sum(ways * weight(m) for m, ways in enumerate(everything))
+        if norm == 0:
+            return self.estimate_probabilities(components, minesLeft,
+                                               unknown)
+
+        # estimated components only get their own cells' probabilities
+        probabilities, _ = self.estimate_probabilities(estimated, minesLeft,
+                                                       unknown)
+        for index, (cells, _) in enumerate(exact):
+            # configurations of all other components
+            others = [1]
+            for otherIndex, (counts, _) in enumerate(counted):
+                if otherIndex != index:
+                    others = convolve(others, counts)
+
+            cellCounts = counted[index][1]
+            mineWays = dict.fromkeys(cells, 0)
+            for m in range(len(cellCounts)):
+                rest = sum(
+                    ways * weight(m + n) for n, ways in enumerate(others)
+                )
+                if rest:
+                    for cell in cells:
+                        mineWays[cell] += cellCounts[m][cell] * rest
+            for cell in cells:
+                probabilities[cell] = mineWays[cell] / norm
+
+        # expected number of mines outside the frontier
+        outsideProbability = None
+        if outside:
+            expected = sum(ways * weight(m) * (minesLeft - m)
+                           for m, ways in enumerate(everything))
+            outsideProbability = expected / norm / outside
+        return probabilities, outsideProbability
+
+    def estimate_probabilities(self, components, minesLeft, unknown):
+        """
+        Cheap fallback for mine_probabilities: each frontier cell gets the
+        highest mine density of the sentences containing it, and other
+        unknown cells get the overall density of mines left.
+        """
+        probabilities = dict()
+        for _, sentences in components:
+            for sentence in sentences:
+                density = sentence.count / len(sentence.cells)
+                for cell in sentence.cells:
+                    probabilities[cell] = max(
+                        probabilities.get(cell, 0), density
+                    )
+
+        outsideProbability = None
+        if unknown:
+            if minesLeft is not None:
+                outsideProbability = minesLeft / unknown
+            elif probabilities:
+                outsideProbability = \
+                    sum(probabilities.values()) / len(probabilities)
+        return probabilities, outsideProbability
+
+    def make_probable_move(self, time_limit=0.1):
+        """
+        Returns the move least likely to be a mine, among cells that
+        have not already been chosen and are not known to be mines.
+        Falls back to make_random_move when nothing is known.
+        """
+        probabilities, outsideProbability = self.mine_probabilities(time_limit)
+        if not probabilities:
+            return self.make_random_move()
+
+        # least likely frontier cell, breaking ties at random
+        lowest = min(probabilities.values())
+        best = [cell for cell, p in probabilities.items() if p == lowest]
+
+        # a cell away from the frontier is safer, pick one at random;
+        # sample unknown cells first, only scanning them all if unlucky
+        if outsideProbability is not None and outsideProbability < lowest:
+            for _ in range(32):
+                cell = random.choice(self.unknownCells)
+                if cell not in self.safes and cell not in probabilities:
+                    return cell
+            outside = [
+                cell for cell in self.unknownCells
+                if cell not in self.safes and cell not in probabilities
+            ]
+            if outside:
+                return random.choice(outside)
+        return random.choice(best)
@@ -43,7 +43,7 @@ mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+ai = MinesweeperAI(height=HEIGHT, width=WIDTH, total_mines=MINES)
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
@@ -192,12 +192,12 @@ while True:
         if aiButton.collidepoint(mouse) and not lost:
             move = ai.make_safe_move()
             if move is None:
-                move = ai.make_random_move()
+                move = ai.make_probable_move()
                 if move is None:
                     flags = ai.mines.copy()
                     print("No moves left to make.")
                 else:
-                    print("No known safe moves, AI making random move.")
+                    print("No known safe moves, AI guessing least likely mine.")
             else:
                 print("AI making safe move.")
             time.sleep(0.1)
@@ -205,7 +205,7 @@ while True:
         # Reset game state
         elif resetButton.collidepoint(mouse):
             game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+            ai = MinesweeperAI(height=HEIGHT, width=WIDTH, total_mines=MINES)
             revealed = set()
             flags = set()
             safes = set()
@@ -227,9 +227,10 @@ while True:
         if game.is_mine(move):
             lost = True
         else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
+            # reveal move, flood filling any area with no nearby mines
+            counts = game.reveal(move, revealed)
+            revealed.update(counts)
+            ai.add_knowledge_batch(counts)
     safes = ai.safes
     knownMines = ai.mines
     pygame.display.flip()
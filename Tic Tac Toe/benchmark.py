@@ -0,0 +1,144 @@
+"""
+Node-count benchmark for the Tic Tac Toe search
+
+For every opening position (up to symmetry, with at most `depth` marks on
+the board), counts the boards expanded when solving it with:
+    legacy  - the original search, which passed a single bound to the child
+    window  - alpha-beta with both bounds and move ordering
+    table   - alpha-beta with a fresh transposition table per position
+
+Usage: python benchmark.py [depth]
+"""
+
+import math
+import sys
+import time
+
+import tictactoe as ttt
+
+# number of boards visited by the legacy search
+legacyStats = {"nodes": 0}
+
+
+def legacyMaxValue(board, vMax):
+    """
+    Original max search: prunes against the parent's running value only
+    """
+    legacyStats["nodes"] += 1
+    if ttt.terminal(board):
+        return ttt.utility(board)
+    v = -math.inf
+    for move in ttt.actions(board):
+        v = max(v, legacyMinValue(ttt.result(board, move), v))
+        if v > vMax:
+            break
+    return v
+
+
+def legacyMinValue(board, vMin):
+    """
+    Original min search: prunes against the parent's running value only
+    """
+    legacyStats["nodes"] += 1
+    if ttt.terminal(board):
+        return ttt.utility(board)
+    v = math.inf
+    for move in ttt.actions(board):
+        v = min(v, legacyMaxValue(ttt.result(board, move), v))
+        if v < vMin:
+            break
+    return v
+
+
+def legacy_minimax(board):
+    """
+    Original root search: each move is searched with the best value so far
+    """
+    optimalAction = None
+    if ttt.player(board) == ttt.X:
+        v = -math.inf
+        for move in ttt.actions(board):
+            moveUtility = legacyMinValue(ttt.result(board, move), v)
+            if moveUtility > v:
+                v = moveUtility
+                optimalAction = move
+            if v == 1:
+                break
+    else:
+        v = math.inf
+        for move in ttt.actions(board):
+            moveUtility = legacyMaxValue(ttt.result(board, move), v)
+            if moveUtility < v:
+                v = moveUtility
+                optimalAction = move
+            if v == -1:
+                break
+    return optimalAction
+
+
+def opening_positions(depth):
+    """
+    Returns one board for each opening position, up to symmetry,
+    with at most `depth` marks on it.
+    """
+    positions = dict()
+    frontier = [ttt.initial_state()]
+    for _ in range(depth + 1):
+        nextFrontier = []
+        for board in frontier:
+            key = ttt.canonical_hash(board)
+            if key in positions or ttt.terminal(board):
+                continue
+            positions[key] = board
+            for move in ttt.actions(board):
+                nextFrontier.append(ttt.result(board, move))
+        frontier = nextFrontier
+    return positions
+
+
+def count_nodes(board):
+    """
+    Returns the node counts and run times of each search on the board.
+    """
+    counts = dict()
+
+    legacyStats["nodes"] = 0
+    start = time.perf_counter()
+    legacy_minimax(board)
+    counts["legacy"] = (legacyStats["nodes"], time.perf_counter() - start)
+
+    for name, transpositions in (("window", False), ("table", True)):
+        ttt.use_transpositions = transpositions
+        ttt.clear_transposition_table()
+        ttt.searchStats["nodes"] = 0
+        start = time.perf_counter()
+        ttt.minimax(board, use_book=False)
+        counts[name] = (ttt.searchStats["nodes"], time.perf_counter() - start)
+    ttt.use_transpositions = True
+
+    return counts
+
+
+def main():
+    if len(sys.argv) not in [1, 2]:
+        sys.exit("Usage: python benchmark.py [depth]")
+    depth = int(sys.argv[1]) if len(sys.argv) == 2 else 1
+
+    names = ("legacy", "window", "table")
+    totals = dict.fromkeys(names, 0)
+    print(f"{'position':<12}" + "".join(f"{name:>16}" for name in names))
+
+    for key, board in sorted(opening_positions(depth).items()):
+        counts = count_nodes(board)
+        row = f"{key:<12}"
+        for name in names:
+            nodes, seconds = counts[name]
+            totals[name] += nodes
+            row += f"{nodes:>9} {seconds:5.2f}s"
+        print(row)
+
+    print(f"{'total':<12}" + "".join(f"{totals[name]:>16}" for name in names))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Tic Tac Toe Player backed by bitboards
+
+A position is a pair of integers (xBits, oBits). Bit k of a mask is set when
+that player occupies cell (k // board_size, k % board_size). The functions
+taking a `board` keep the same API as tictactoe.py and convert nested-list
+boards to bitboards and back, so this module can be used in its place.
+"""
+
+import math
+
+X = "X"
+O = "O"
+EMPTY = None
+board_size = 3
+
+# mask with a bit set for every cell on the board
+FULL = (1 << (board_size * board_size)) - 1
+
+# masks of every row, column and diagonal
+LINES = (
+    [sum(1 << (i * board_size + j) for j in range(board_size))
+     for i in range(board_size)] +
+    [sum(1 << (i * board_size + j) for i in range(board_size))
+     for j in range(board_size)] +
+    [sum(1 << (k * board_size + k) for k in range(board_size)),
+     sum(1 << (k * board_size + board_size - 1 - k)
+         for k in range(board_size))]
+)
+
+# look-up tables indexed by a player's mask: whether the mask contains a
+# full line, and the number of cells occupied
+WINNING = [any(bits & line == line for line in LINES) for bits in range(FULL + 1)]
+POPCOUNT = [bin(bits).count("1") for bits in range(FULL + 1)]
+
+# cell index of a single-bit mask
+BIT_INDEX = {1 << k: k for k in range(board_size * board_size)}
+
+
+def to_bitboard(board):
+    """
+    Returns the (xBits, oBits) pair for a nested-list board.
+    """
+    xBits = 0
+    oBits = 0
+    for i in range(board_size):
+        for j in range(board_size):
+            if board[i][j] == X:
+                xBits |= 1 << (i * board_size + j)
+            elif board[i][j] == O:
+                oBits |= 1 << (i * board_size + j)
+    return xBits, oBits
+
+
+def to_board(xBits, oBits):
+    """
+    Returns the nested-list board for a (xBits, oBits) pair.
+    """
+    board = []
+    for i in range(board_size):
+        row = []
+        for j in range(board_size):
+            bit = 1 << (i * board_size + j)
+            if xBits & bit:
+                row.append(X)
+            elif oBits & bit:
+                row.append(O)
+            else:
+                row.append(EMPTY)
+        board.append(row)
+    return board
+
+
+def initial_state():
+    """
+    Returns starting state of the board.
+    """
+    return to_board(0, 0)
+
+
+def player(board):
+    """
+    Returns player who has the next turn on a board.
+    """
+    xBits, oBits = to_bitboard(board)
+    return O if POPCOUNT[xBits] > POPCOUNT[oBits] else X
+
+
+def actions(board):
+    """
+    Returns set of all possible actions (i, j) available on the board.
+    """
+    xBits, oBits = to_bitboard(board)
+    free = FULL & ~(xBits | oBits)
+    actionSet = set()
+    while free:
+        bit = free & -free
+        free ^= bit
+        actionSet.add(divmod(BIT_INDEX[bit], board_size))
+    return actionSet
+
+
+def result(board, action):
+    """
+    Returns the board that results from making move (i, j) on the board.
+    """
+    xBits, oBits = to_bitboard(board)
+    bit = 1 << (action[0] * board_size + action[1])
+
+    # if position of action is not empty, raise error
+    if (xBits | oBits) & bit:
+        raise NameError('Invalid Move')
+
+    if POPCOUNT[xBits] > POPCOUNT[oBits]:
+        return to_board(xBits, oBits | bit)
+    return to_board(xBits | bit, oBits)
+
+
+def winner(board):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    xBits, oBits = to_bitboard(board)
+    if WINNING[xBits]:
+        return X
+    if WINNING[oBits]:
+        return O
+    return None
+
+
+def terminal(board):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    xBits, oBits = to_bitboard(board)
+    return WINNING[xBits] or WINNING[oBits] or (xBits | oBits) == FULL
+
+
+def utility(board):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    xBits, oBits = to_bitboard(board)
+    if WINNING[xBits]:
+        return 1
+    if WINNING[oBits]:
+        return -1
+    return 0
+
+
+def negamax(own, other, alpha, beta):
+    """
+    Calculate the utility of a position for the player to move, who owns
+    the cells in `own`, searching only with integer operations.
+    The opponent has just moved, so only their mask can hold a line.
+    """
+    if WINNING[other]:
+        return -1
+    free = FULL & ~(own | other)
+    if not free:
+        return 0
+
+    v = -math.inf
+    while free:
+        bit = free & -free
+        free ^= bit
+        v = max(v, -negamax(other, own | bit, -beta, -alpha))
+        alpha = max(alpha, v)
+
+        # (alpha-beta pruning)
+        if alpha >= beta:
+            break
+    return v
+
+
+def minimax(board):
+    """
+    Returns the optimal action for the current player on the board.
+    """
+    xBits, oBits = to_bitboard(board)
+
+    # return None if board is terminal
+    if WINNING[xBits] or WINNING[oBits] or (xBits | oBits) == FULL:
+        return None
+
+    if POPCOUNT[xBits] > POPCOUNT[oBits]:
+        own, other = oBits, xBits
+    else:
+        own, other = xBits, oBits
+
+    # loop through free cells to find move with max utility for the mover
+    optimalBit = 0
+    v = -math.inf
+    free = FULL & ~(own | other)
+    while free:
+        bit = free & -free
+        free ^= bit
+        moveUtility = -negamax(other, own | bit, -1, -v)
+        if moveUtility > v:
+            v = moveUtility
+            optimalBit = bit
+
+        # 1 is maximum utility possible, return optimal move immediately
+        if v == 1:
+            break
+
+    return divmod(BIT_INDEX[optimalBit], board_size)
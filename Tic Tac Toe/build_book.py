@@ -0,0 +1,68 @@
+"""
+Build the Tic Tac Toe opening book
+
+Solves every reachable 3 x 3 position once, up to symmetry, and writes the
+best action and utility of each canonical position to the book file read
+by tictactoe.load_book.
+
+Usage: python build_book.py [output]
+"""
+
+import math
+import sys
+
+import tictactoe as ttt
+
+
+def canonical_positions():
+    """
+    Returns a dictionary of every reachable non-terminal position,
+    keyed by canonical hash, with the canonical board as value.
+    """
+    positions = dict()
+    frontier = [ttt.initial_state()]
+
+    while frontier:
+        board = frontier.pop()
+        key = ttt.canonical_hash(board)
+        if key in positions or ttt.terminal(board):
+            continue
+
+        # store board in its canonical orientation
+        positions[key] = ttt.canonical_board(board)[0]
+        for move in ttt.actions(board):
+            frontier.append(ttt.result(board, move))
+
+    return positions
+
+
+def build_book(filename=ttt.BOOK_FILE):
+    """
+    Solve all canonical positions and write them to `filename`.
+    Returns the number of positions written.
+    """
+    positions = canonical_positions()
+
+    with open(filename, "w") as f:
+        for key in sorted(positions):
+            board = positions[key]
+            i, j = ttt.minimax(board, use_book=False)
+            if ttt.player(board) == ttt.X:
+                value = ttt.maxValue(board, -math.inf, math.inf)
+            else:
+                value = ttt.minValue(board, -math.inf, math.inf)
+            f.write(f"{key} {i} {j} {value}\n")
+
+    return len(positions)
+
+
+def main():
+    if len(sys.argv) not in [1, 2]:
+        sys.exit("Usage: python build_book.py [output]")
+    filename = sys.argv[1] if len(sys.argv) == 2 else ttt.BOOK_FILE
+    count = build_book(filename)
+    print(f"Wrote {count} positions to {filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,91 @@ Tic Tac Toe Player
 
 import math
 import copy
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 X = "X"
 O = "O"
 EMPTY = None
 board_size = 3
 
+# number of marks in a row needed to win (capped at the board size)
+win_length = 3
 
-def initial_state():
+# bound types for entries in the transposition table
+EXACT = "exact"
+LOWER = "lower"
+UPPER = "upper"
+
+# transposition table shared by every search within a game
+# key is (canonical hash of a board, win length), value is
+# (utility, bound type)
+transpositionTable = dict()
+
+# set to False to search without the transposition table
+use_transpositions = True
+
+# last move that caused an alpha-beta cutoff, keyed by ply
+killerMoves = dict()
+
+# number of boards visited by maxValue/minValue
+searchStats = {"nodes": 0}
+
+# cache of board symmetries, keyed by board size
+symmetryCache = dict()
+
+# cache of move ordering rank of every cell, keyed by board size
+cellRankCache = dict()
+
+# cache of winning lines, keyed by (board size, win length)
+lineCache = dict()
+
+# opening book for the standard 3 x 3 game, written by build_book.py
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.txt")
+
+# canonical hash -> (best action on the canonical board, utility),
+# loaded on first use
+openingBook = None
+
+
+def initial_state(size=board_size):
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * size for _ in range(size)]
+
+
+def lines(size, length):
+    """
+    Returns every row, column and diagonal segment of `length` cells
+    on a board of `size` x `size`, as lists of positions (i, j).
+    """
+    if (size, length) in lineCache:
+        return lineCache[size, length]
+
+    lineTable = []
+    # directions: right, down, down-right, down-left
+    for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for i in range(size):
+            for j in range(size):
+                endI = i + di * (length - 1)
+                endJ = j + dj * (length - 1)
+                if 0 <= endI < size and 0 <= endJ < size:
+                    lineTable.append(
+                        [(i + di * k, j + dj * k) for k in range(length)]
+                    )
+
+    lineCache[size, length] = lineTable
+    return lineTable
+
+
+def board_lines(board):
+    """
+    Returns the winning lines for the size of the board.
+    """
+    size = len(board)
+    return lines(size, min(win_length, size))
 
 
 def player(board):
@@ -29,8 +100,8 @@ def player(board):
     oCount = 0
 
     # loop through position on board to count number of X and O played
-    for i in range(board_size):
-        for j in range(board_size):
+    for i in range(len(board)):
+        for j in range(len(board)):
             if board[i][j] == X:
                 xCount += 1
             elif board[i][j] == O:
@@ -57,8 +128,8 @@ def actions(board):
 
     # loop through positions on board to find empty position,
     # then add to possible action set
-    for i in range(board_size):
-        for j in range(board_size):
+    for i in range(len(board)):
+        for j in range(len(board)):
             if board[i][j] == EMPTY:
                 actionSet.add((i, j))
 
@@ -89,25 +160,12 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # check rows for winners
-    for i in range(board_size):
-        if board[i][0] == board[i][1] and board[i][0] == board[i][2] \
-                and board[i][2] != EMPTY:
-            return board[i][0]
-
-    # check columns for winners
-    for j in range(board_size):
-        if board[0][j] == board[1][j] and board[0][j] == board[2][j] \
-                and board[2][j] != EMPTY:
-            return board[0][j]
-
-    # check diagonals for winners
-    if board[0][0] == board[1][1] and board[1][1] == board[2][2] \
-            and board[2][2] != EMPTY:
-        return board[1][1]
-    if board[2][0] == board[1][1] and board[1][1] == board[0][2] \
-            and board[0][2] != EMPTY:
-        return board[1][1]
+    # check rows, columns and diagonals for a line held by one player
+    for line in board_lines(board):
+        i, j = line[0]
+        first = board[i][j]
+        if first != EMPTY and all(board[r][c] == first for r, c in line):
+            return first
 
     # return None if no winners found
     return None
@@ -123,8 +181,8 @@ def terminal(board):
         return True
 
     # loop through position, if board is not full return False
-    for i in range(board_size):
-        for j in range(board_size):
+    for i in range(len(board)):
+        for j in range(len(board)):
             if board[i][j] == EMPTY:
                 return False
 
@@ -148,70 +206,372 @@ def utility(board):
     raise NotImplementedError
 
 
-def maxValue(board, vMax):
+def symmetries(size):
+    """
+    Returns the 8 symmetries (rotations and reflections) of a square board.
+    Each symmetry is a list of positions (i, j), where the k-th cell of the
+    transformed board, read row by row, is taken from that position.
+    """
+    if size in symmetryCache:
+        return symmetryCache[size]
+
+    transforms = []
+    for rotation in range(4):
+        for reflect in (False, True):
+            cells = []
+            for i in range(size):
+                for j in range(size):
+                    row, col = i, size - 1 - j if reflect else j
+                    # rotate position by 90 degrees for each rotation
+                    for _ in range(rotation):
+                        row, col = col, size - 1 - row
+                    cells.append((row, col))
+            transforms.append(cells)
+
+    symmetryCache[size] = transforms
+    return transforms
+
+
+def canonical_form(board):
+    """
+    Returns the hash of the board that is shared by all of its symmetries,
+    and the symmetry that maps the board to it.
+    """
+    return min(
+        ("".join(board[i][j] or "-" for i, j in transform), transform)
+        for transform in symmetries(len(board))
+    )
+
+
+def canonical_board(board):
+    """
+    Returns the board in the orientation of its canonical hash, and the
+    symmetry used. Action (i, j) on the returned board is action
+    transform[i * size + j] on the original board.
+    """
+    size = len(board)
+    _, transform = canonical_form(board)
+    canonical = [
+        [board[i][j] for i, j in transform[row * size:(row + 1) * size]]
+        for row in range(size)
+    ]
+    return canonical, transform
+
+
+def canonical_hash(board):
+    """
+    Returns a hash of the board that is shared by all of its symmetries.
+    """
+    return canonical_form(board)[0]
+
+
+def load_book(filename=BOOK_FILE):
+    """
+    Load the opening book into memory. Each line of the file holds
+    a canonical hash, the best action (i, j) and the utility of the board.
+    A missing file leaves the book empty, so minimax falls back to search.
+    """
+    global openingBook
+    openingBook = dict()
+    if not os.path.exists(filename):
+        return openingBook
+
+    with open(filename) as f:
+        for line in f:
+            key, i, j, value = line.split()
+            openingBook[key] = ((int(i), int(j)), int(value))
+    return openingBook
+
+
+def book_move(board):
+    """
+    Returns the opening book action for the board, or None if the board
+    is not covered by the book.
+    """
+    # the book only covers the standard 3 x 3 game
+    if len(board) != 3 or win_length != 3:
+        return None
+    if openingBook is None:
+        load_book()
+
+    key, transform = canonical_form(board)
+    if key not in openingBook:
+        return None
+
+    # map action on the canonical board back onto this board
+    (i, j), _ = openingBook[key]
+    return transform[i * 3 + j]
+
+
+def table_key(board):
+    """
+    Returns the transposition table key of the board. The win length is
+    part of the key, since the same board has a different value when
+    a different number of marks in a row is needed to win.
+    """
+    return canonical_hash(board), win_length
+
+
+def clear_transposition_table():
+    """
+    Forget all positions searched so far (e.g. when a new game starts).
+    """
+    transpositionTable.clear()
+    killerMoves.clear()
+
+
+def ordered_actions(board):
+    """
+    Returns the possible actions on the board, best candidates first:
+    the killer move that last caused a cutoff at this ply, then the cells
+    nearest the center, with corners ahead of edges at the same distance.
+    """
+    size = len(board)
+    if size not in cellRankCache:
+        # rank cells by distance from the center, with corners ahead of edges
+        rank = dict()
+        center = (size - 1) / 2
+        for i in range(size):
+            for j in range(size):
+                corner = i in (0, size - 1) and j in (0, size - 1)
+                distance = max(abs(i - center), abs(j - center))
+                rank[i, j] = (distance, not corner)
+        cellRankCache[size] = rank
+    rank = cellRankCache[size]
+
+    actionList = sorted(actions(board), key=rank.get)
+    killer = killerMoves.get(size * size - len(actionList))
+    if killer in actionList:
+        actionList.remove(killer)
+        actionList.insert(0, killer)
+    return actionList
+
+
+def maxValue(board, alpha, beta):
     """
-    Calculate the max utility achievable with a board state
+    Calculate the max utility achievable with a board state,
+    searching only for utilities inside the window (alpha, beta)
     """
+    searchStats["nodes"] += 1
+
     # if board reaches terminal state, return utility
     if terminal(board):
         return utility(board)
 
+    # reuse stored result if it is exact or narrows the window to nothing
+    key = table_key(board)
+    if use_transpositions and key in transpositionTable:
+        value, bound = transpositionTable[key]
+        if bound == EXACT:
+            return value
+        if bound == LOWER:
+            alpha = max(alpha, value)
+        elif bound == UPPER:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+    alphaOrig = alpha
+
     # initialize utility variable
     v = -math.inf
 
     # loop through all possible moves to find move with maximum utility
-    for move in actions(board):
-        v = max(v, minValue(result(board, move), v))
+    for move in ordered_actions(board):
+        v = max(v, minValue(result(board, move), alpha, beta))
+        alpha = max(alpha, v)
 
-        # if utility of move is larger than vMax, break out of loop
+        # if min player would never allow this board, break out of loop
         # (alpha-beta pruning)
-        if v > vMax:
-           break
+        if alpha >= beta:
+            killerMoves[len(board) ** 2 - len(actions(board))] = move
+            break
+
+    # a pruned search only proves a bound on the utility
+    if use_transpositions:
+        if v >= beta:
+            transpositionTable[key] = (v, LOWER)
+        elif v <= alphaOrig:
+            transpositionTable[key] = (v, UPPER)
+        else:
+            transpositionTable[key] = (v, EXACT)
     return v
 
 
-def minValue(board, vMin):
+def minValue(board, alpha, beta):
     """
-    Calculate the min utility achievable with a board state
+    Calculate the min utility achievable with a board state,
+    searching only for utilities inside the window (alpha, beta)
     """
+    searchStats["nodes"] += 1
+
     # if board reaches terminal state, return utility
     if terminal(board):
         return utility(board)
 
+    # reuse stored result if it is exact or narrows the window to nothing
+    key = table_key(board)
+    if use_transpositions and key in transpositionTable:
+        value, bound = transpositionTable[key]
+        if bound == EXACT:
+            return value
+        if bound == LOWER:
+            alpha = max(alpha, value)
+        elif bound == UPPER:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+    betaOrig = beta
+
     # initialize utility variable
     v = math.inf
 
     # loop through all possible moves to find move with minimum utility
-    for move in actions(board):
-        v = min(v, maxValue(result(board, move), v))
+    for move in ordered_actions(board):
+        v = min(v, maxValue(result(board, move), alpha, beta))
+        beta = min(beta, v)
 
-        # if utility of move is less than vMin, break out of loop
+        # if max player would never allow this board, break out of loop
         # (alpha-beta pruning)
-        if v < vMin:
+        if alpha >= beta:
+            killerMoves[len(board) ** 2 - len(actions(board))] = move
             break
+
+    # a pruned search only proves a bound on the utility
+    if use_transpositions:
+        if v <= alpha:
+            transpositionTable[key] = (v, UPPER)
+        elif v >= betaOrig:
+            transpositionTable[key] = (v, LOWER)
+        else:
+            transpositionTable[key] = (v, EXACT)
     return v
 
 
-def minimax(board):
+def evaluate(board):
+    """
+    Estimate the utility of a non-terminal board, strictly between -1 and 1.
+    Each line still open to only one player scores for that player,
+    weighted by how many of its cells they already hold.
+    """
+    xScore = 0
+    oScore = 0
+    for line in board_lines(board):
+        marks = [board[i][j] for i, j in line]
+        if O not in marks:
+            xScore += 4 ** marks.count(X) - 1
+        elif X not in marks:
+            oScore += 4 ** marks.count(O) - 1
+    return (xScore - oScore) / (xScore + oScore + 1)
+
+
+def depthLimitedValue(board, depth, alpha, beta, deadline):
+    """
+    Calculate the utility of a board with alpha-beta search cut off after
+    `depth` moves, using the heuristic evaluation at the cut-off.
+    Raises TimeoutError once `deadline` (a time.perf_counter value) passes.
+    """
+    if time.perf_counter() > deadline:
+        raise TimeoutError
+
+    # if board reaches terminal state, return utility
+    if terminal(board):
+        return utility(board)
+    if depth == 0:
+        return evaluate(board)
+
+    if player(board) == X:
+        v = -math.inf
+        for move in ordered_actions(board):
+            v = max(v, depthLimitedValue(
+                result(board, move), depth - 1, alpha, beta, deadline))
+            alpha = max(alpha, v)
+            if alpha >= beta:
+                break
+    else:
+        v = math.inf
+        for move in ordered_actions(board):
+            v = min(v, depthLimitedValue(
+                result(board, move), depth - 1, alpha, beta, deadline))
+            beta = min(beta, v)
+            if alpha >= beta:
+                break
+    return v
+
+
+def iterative_deepening(board, time_limit):
+    """
+    Returns the best action found by searching one move deeper at a time
+    until the whole game is solved or `time_limit` seconds have passed.
+    """
+    deadline = time.perf_counter() + time_limit
+    currPlayer = player(board)
+    actionList = sorted(actions(board))
+
+    # fall back to any legal move if not even depth 1 completes in time
+    optimalAction = actionList[0]
+
+    for depth in range(1, len(actionList) + 1):
+        # search best move of the previous depth first to improve pruning
+        actionList.remove(optimalAction)
+        actionList.insert(0, optimalAction)
+
+        try:
+            bestAction = None
+            alpha = -math.inf
+            beta = math.inf
+            for move in actionList:
+                moveUtility = depthLimitedValue(
+                    result(board, move), depth - 1, alpha, beta, deadline)
+                if currPlayer == X and moveUtility > alpha:
+                    alpha = moveUtility
+                    bestAction = move
+                elif currPlayer == O and moveUtility < beta:
+                    beta = moveUtility
+                    bestAction = move
+        except TimeoutError:
+            break
+
+        # only use fully searched depths
+        optimalAction = bestAction or actionList[0]
+
+        # stop once a forced win is found
+        if (currPlayer == X and alpha == 1) or (currPlayer == O and beta == -1):
+            break
+
+    return optimalAction
+
+
+def minimax(board, time_limit=None, use_book=True):
     """
     Returns the optimal action for the current player on the board.
+    Boards covered by the opening book are answered without searching.
+    If `time_limit` (in seconds) is given, search by iterative deepening
+    and return the best action found within that time instead.
     """
     # return None if board is terminal
     if terminal(board):
         return None
 
+    if use_book:
+        bookAction = book_move(board)
+        if bookAction is not None:
+            return bookAction
+
+    if time_limit is not None:
+        return iterative_deepening(board, time_limit)
+
     # initialize optimal Action variable
     optimalAction = tuple()
 
-    # populate action list given board state
-    actionList = actions(board)
+    # populate action list given board state, most promising moves first
+    actionList = ordered_actions(board)
 
     # if player is X, optimal move would be one with max utility
     if player(board) == X:
         v = -math.inf
         # loop through action list to find move with max utility
         for move in actionList:
-            moveUtility = minValue(result(board, move), v)
+            moveUtility = minValue(result(board, move), v, math.inf)
             if moveUtility > v:
                 v = moveUtility
                 optimalAction = move
@@ -226,7 +586,7 @@ def minimax(board):
 
         # loop through action list to find move with min utility
         for move in actionList:
-            moveUtility = maxValue(result(board, move), v)
+            moveUtility = maxValue(result(board, move), -math.inf, v)
             if moveUtility < v:
                 v = moveUtility
                 optimalAction = move
@@ -237,3 +597,70 @@ def minimax(board):
 
     return optimalAction
     raise NotImplementedError
+
+
+def solve(board):
+    """
+    Returns the utility of the board under optimal play and the optimal
+    action for the current player (None if the board is terminal).
+    """
+    if terminal(board):
+        return utility(board), None
+
+    if player(board) == X:
+        value = maxValue(board, -math.inf, math.inf)
+    else:
+        value = minValue(board, -math.inf, math.inf)
+
+    # board is now in the transposition table, so this search is cheap
+    return value, minimax(board, use_book=False)
+
+
+def solve_chunk(boards, length):
+    """
+    Solve a list of boards in a worker process, sharing the worker's
+    transposition table across the whole list.
+    """
+    global win_length
+    win_length = length
+    return [solve(board) for board in boards]
+
+
+def solve_many(boards, processes=None, chunk_size=64):
+    """
+    Returns a list with the (utility, optimal action) of every board.
+    Boards equal up to symmetry are solved only once, and all boards
+    share one transposition table. If `processes` is more than 1, the
+    distinct boards are split into chunks solved by a pool of processes.
+    """
+    # keep one canonical board for each group of symmetric boards
+    canonicalBoards = dict()
+    forms = []
+    for board in boards:
+        canonical, transform = canonical_board(board)
+        key = canonical_hash(canonical)
+        forms.append((key, transform, len(board)))
+        canonicalBoards[key] = canonical
+    keys = list(canonicalBoards)
+    uniqueBoards = [canonicalBoards[key] for key in keys]
+
+    if processes is not None and processes > 1:
+        chunks = [uniqueBoards[k:k + chunk_size]
+                  for k in range(0, len(uniqueBoards), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            solved = []
+            for chunk in executor.map(solve_chunk, chunks,
+                                      [win_length] * len(chunks)):
+                solved.extend(chunk)
+    else:
+        solved = [solve(board) for board in uniqueBoards]
+    solutions = dict(zip(keys, solved))
+
+    # map each action on the canonical board back onto the original board
+    results = []
+    for key, transform, size in forms:
+        value, action = solutions[key]
+        if action is not None:
+            action = transform[action[0] * size + action[1]]
+        results.append((value, action))
+    return results
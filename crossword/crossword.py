@@ -1,3 +1,6 @@
+from types import MappingProxyType
+
+
 class Variable():
 
     ACROSS = "across"
@@ -35,6 +38,73 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class WordIndex():
+    """
+    Immutable index of a vocabulary, with words grouped by length.
+    A word is identified by its position in the sorted words of its length,
+    and a set of words of one length is stored as a bitset: an integer
+    with bit k set if it contains word k of that length.
+    """
+
+    def __init__(self, words):
+        """Create a new index of a collection of words."""
+        buckets = dict()
+        for word in sorted(words):
+            buckets.setdefault(len(word), []).append(word)
+
+        # length -> tuple of the words of that length
+        self.buckets = MappingProxyType({
+            length: tuple(bucket) for length, bucket in buckets.items()
+        })
+
+        # word -> its ID among the words of its length
+        self.ids = MappingProxyType({
+            word: k
+            for bucket in self.buckets.values()
+            for k, word in enumerate(bucket)
+        })
+
+        # (length, position) -> letter -> bitset of the words of that
+        # length with that letter at that position
+        letters = dict()
+        for length, bucket in self.buckets.items():
+            for k, word in enumerate(bucket):
+                bit = 1 << k
+                for position, letter in enumerate(word):
+                    table = letters.setdefault((length, position), {})
+                    table[letter] = table.get(letter, 0) | bit
+        self.letters = MappingProxyType({
+            key: MappingProxyType(table) for key, table in letters.items()
+        })
+
+    def all_words(self, length):
+        """Return the bitset of all words of a given length."""
+        return (1 << len(self.buckets.get(length, ()))) - 1
+
+    def letter_words(self, length, position):
+        """
+        Return a mapping from each letter to the bitset of words of a given
+        length with that letter at a given position.
+        """
+        return self.letters.get((length, position), MappingProxyType({}))
+
+    def words(self, length, domain):
+        """Return the list of words of a given length in a bitset."""
+        bucket = self.buckets.get(length, ())
+        words = []
+        while domain:
+            bit = domain & -domain
+            words.append(bucket[bit.bit_length() - 1])
+            domain ^= bit
+        return words
+
+    @staticmethod
+    def count(domain):
+        """Return the number of words in a bitset."""
+        # int.bit_count needs Python 3.10
+        return bin(domain).count("1")
+
+
 class Crossword():
 
     def __init__(self, structure_file, words_file):
@@ -57,9 +127,10 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
+        # Save vocabulary list, and index it once for every solver
         with open(words_file) as f:
             self.words = set(f.read().upper().splitlines())
+        self.index = WordIndex(self.words)
 
         # Determine variable set
         self.variables = set()
@@ -1,4 +1,5 @@
 import sys
+from collections import deque
 
 from crossword import *
 
@@ -10,8 +11,12 @@ class CrosswordCreator():
         Create new CSP crossword generate.
         """
         self.crossword = crossword
+
+        # domains are bitsets over the words of the variable's length,
+        # referencing the crossword's shared word index by ID
+        self.index = self.crossword.index
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.index.all_words(var.length)
             for var in self.crossword.variables
         }
 
@@ -99,7 +104,8 @@ class CrosswordCreator():
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
         """
-        raise NotImplementedError
+        for var in self.domains:
+            self.domains[var] &= self.index.all_words(var.length)
 
     def revise(self, x, y):
         """
@@ -110,7 +116,24 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
-        raise NotImplementedError
+        overlap = self.crossword.overlaps[x, y]
+        if overlap is None:
+            return False
+        i, j = overlap
+
+        # words of `x` with a letter at the overlap that some word of `y`
+        # also has there, found one letter at a time
+        xLetters = self.index.letter_words(x.length, i)
+        supported = 0
+        for letter, words in self.index.letter_words(y.length, j).items():
+            if self.domains[y] & words:
+                supported |= xLetters.get(letter, 0)
+
+        domain = self.domains[x] & supported
+        if domain == self.domains[x]:
+            return False
+        self.domains[x] = domain
+        return True
 
     def ac3(self, arcs=None):
         """
@@ -121,21 +144,56 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
-        raise NotImplementedError
+        if arcs is None:
+            arcs = [
+                (x, y) for x in self.crossword.variables
+                for y in self.crossword.neighbors(x)
+            ]
+        queue = deque(arcs)
+        queued = set(arcs)
+
+        while queue:
+            x, y = queue.popleft()
+            queued.discard((x, y))
+            if self.revise(x, y):
+                if not self.domains[x]:
+                    return False
+
+                # domain of x shrank, so recheck every arc into x
+                for z in self.crossword.neighbors(x):
+                    if z != y and (z, x) not in queued:
+                        queue.append((z, x))
+                        queued.add((z, x))
+        return True
 
     def assignment_complete(self, assignment):
         """
         Return True if `assignment` is complete (i.e., assigns a value to each
         crossword variable); return False otherwise.
         """
-        raise NotImplementedError
+        return all(var in assignment for var in self.crossword.variables)
 
     def consistent(self, assignment):
         """
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
         """
-        raise NotImplementedError
+        # every word must be distinct
+        if len(set(assignment.values())) != len(assignment):
+            return False
+
+        for var, word in assignment.items():
+            # every word must fit its variable
+            if len(word) != var.length:
+                return False
+
+            # overlapping words must share the letter at the overlap
+            for neighbor in self.crossword.neighbors(var):
+                if neighbor in assignment:
+                    i, j = self.crossword.overlaps[var, neighbor]
+                    if word[i] != assignment[neighbor][j]:
+                        return False
+        return True
 
     def order_domain_values(self, var, assignment):
         """
@@ -144,7 +202,24 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
-        raise NotImplementedError
+        neighbors = [
+            (neighbor, self.crossword.overlaps[var, neighbor])
+            for neighbor in self.crossword.neighbors(var)
+            if neighbor not in assignment
+        ]
+
+        def ruled_out(word):
+            # words of each neighbor without the letter `word` puts there
+            count = 0
+            for neighbor, (i, j) in neighbors:
+                matching = self.index.letter_words(
+                    neighbor.length, j
+                ).get(word[i], 0)
+                count += self.index.count(self.domains[neighbor] & ~matching)
+            return count
+
+        return sorted(self.index.words(var.length, self.domains[var]),
+                      key=ruled_out)
 
     def select_unassigned_variable(self, assignment):
         """
@@ -154,7 +229,13 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        raise NotImplementedError
+        return min(
+            (var for var in self.crossword.variables if var not in assignment),
+            key=lambda var: (
+                self.index.count(self.domains[var]),
+                -len(self.crossword.neighbors(var))
+            )
+        )
 
     def backtrack(self, assignment):
         """
@@ -165,7 +246,30 @@ class CrosswordCreator():
 
         If no assignment is possible, return None.
         """
-        raise NotImplementedError
+        if self.assignment_complete(assignment):
+            return assignment
+
+        var = self.select_unassigned_variable(assignment)
+        for word in self.order_domain_values(var, assignment):
+            assignment[var] = word
+            if self.consistent(assignment):
+                # domains are integers, so saving them is a shallow copy
+                saved = self.domains.copy()
+                self.domains[var] = 1 << self.index.ids[word]
+
+                # maintain arc consistency with the new assignment
+                arcs = [
+                    (neighbor, var)
+                    for neighbor in self.crossword.neighbors(var)
+                    if neighbor not in assignment
+                ]
+                if self.ac3(arcs):
+                    result = self.backtrack(assignment)
+                    if result is not None:
+                        return result
+                self.domains = saved
+            del assignment[var]
+        return None
 
 
 def main():
@@ -0,0 +1,275 @@
+import os
+import struct
+
+import numpy
+
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
+# binary graph file: magic, then the header fields (page count, link count,
+# size of the name table and the stamp of the corpus it was built from),
+# then the offsets and targets arrays as int64, then the page names
+GRAPH_MAGIC = b"LINKGRF1"
+GRAPH_HEADER = struct.Struct("<8sQQQq")
+
+# number of links stored in each block of an EdgeBlocks
+BLOCK_SIZE = 1 << 22
+
+
+class LinkGraph():
+    """
+    Links between the pages of a corpus, in compressed sparse row form:
+    page `names[p]` links to the pages `targets[offsets[p]:offsets[p + 1]]`.
+    """
+
+    def __init__(self, names, offsets, targets):
+        """Create a new link graph from page names and CSR arrays."""
+        self.names = list(names)
+        self.offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        self.targets = numpy.asarray(targets, dtype=numpy.int64)
+
+        # number of links out of each page; pages without links are dangling
+        self.outdegree = numpy.diff(self.offsets)
+        self.dangling = self.outdegree == 0
+
+        # column-stochastic link matrix, built on first use
+        self.matrix = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Create a link graph from a dictionary mapping each page
+        to the set of pages it links to.
+        """
+        names = sorted(corpus)
+        index = {name: p for p, name in enumerate(names)}
+        offsets = [0]
+        targets = []
+        for name in names:
+            targets.extend(sorted(index[link] for link in corpus[name]))
+            offsets.append(len(targets))
+        return cls(names, offsets, targets)
+
+    @classmethod
+    def from_edges(cls, names, sources, targets):
+        """
+        Create a link graph from an edge list: page `sources[k]` links to
+        page `targets[k]`, both given as indices into `names`. Repeated
+        links and links from a page to itself are dropped.
+        """
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        targets = numpy.asarray(targets, dtype=numpy.int64)
+        n = len(names)
+
+        # sort edges by source, then target, and drop duplicates
+        keep = sources != targets
+        edges = numpy.unique(sources[keep] * n + targets[keep])
+        sources, targets = numpy.divmod(edges, n)
+
+        offsets = numpy.zeros(n + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(sources, minlength=n), out=offsets[1:])
+        return cls(names, offsets, targets)
+
+    def to_corpus(self):
+        """
+        Return a dictionary mapping each page to the set of pages it links to.
+        """
+        return {
+            name: set(
+                self.names[t]
+                for t in self.targets[self.offsets[p]:self.offsets[p + 1]]
+            )
+            for p, name in enumerate(self.names)
+        }
+
+    def save(self, filename, stamp=0):
+        """
+        Write the graph to `filename` in the binary graph format, along
+        with `stamp`, an integer identifying the version of the corpus.
+        The file is replaced at once, so readers never see it half written.
+        """
+        names = "\0".join(self.names).encode("utf-8")
+        header = GRAPH_HEADER.pack(GRAPH_MAGIC, len(self), len(self.targets),
+                                   len(names), stamp)
+        temporary = filename + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(header)
+            f.write(self.offsets.astype("<i8").tobytes())
+            f.write(self.targets.astype("<i8").tobytes())
+            f.write(names)
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load(cls, filename, stamp=None):
+        """
+        Load a graph written by save. The offsets and targets arrays are
+        memory-mapped rather than read, so loading takes time proportional
+        to the number of pages only.
+        Return None if `stamp` is given and differs from the saved stamp.
+        """
+        with open(filename, "rb") as f:
+            magic, nPage, nLinks, nameBytes, savedStamp = \
+                GRAPH_HEADER.unpack(f.read(GRAPH_HEADER.size))
+            if magic != GRAPH_MAGIC:
+                raise ValueError(f"{filename} is not a link graph file")
+            if stamp is not None and stamp != savedStamp:
+                return None
+            f.seek(GRAPH_HEADER.size + 8 * (nPage + 1 + nLinks))
+            names = f.read(nameBytes).decode("utf-8")
+
+        offsets = numpy.memmap(filename, dtype="<i8", mode="r",
+                               offset=GRAPH_HEADER.size, shape=(nPage + 1,))
+        if nLinks:
+            targets = numpy.memmap(
+                filename, dtype="<i8", mode="r",
+                offset=GRAPH_HEADER.size + 8 * (nPage + 1), shape=(nLinks,)
+            )
+        else:
+            # an empty array cannot be memory-mapped
+            targets = numpy.zeros(0, dtype=numpy.int64)
+        return cls(names.split("\0") if nPage else [], offsets, targets)
+
+    def __len__(self):
+        return len(self.names)
+
+    def sources(self):
+        """Return the page each link starts from, in link order."""
+        return numpy.repeat(numpy.arange(len(self)), self.outdegree)
+
+    def link_matrix(self):
+        """
+        Return the column-stochastic link matrix M, where M[t, s] is the
+        probability of following a link from page s to page t. Columns of
+        dangling pages are left empty. Uses SciPy if it is installed,
+        otherwise a NumPy matrix in CSR form (see LinkMatrix).
+        """
+        if self.matrix is not None:
+            return self.matrix
+
+        n = len(self)
+        sources = self.sources()
+        weights = 1 / self.outdegree[sources]
+        if scipy is not None:
+            self.matrix = scipy.sparse.csr_matrix(
+                (weights, (self.targets, sources)), shape=(n, n)
+            )
+        else:
+            self.matrix = LinkMatrix(n, self.targets, sources, weights)
+        return self.matrix
+
+
+class EdgeBlocks():
+    """
+    Links of a graph stored on disk in blocks of (source, target) pairs,
+    sorted by target: block k holds the links to pages bounds[k] up to
+    bounds[k + 1], so it only touches that range of a rank vector.
+    """
+
+    def __init__(self, names, outdegree, bounds, paths):
+        """Create a new set of edge blocks from their files."""
+        self.names = names
+        self.outdegree = outdegree
+        self.dangling = outdegree == 0
+        self.bounds = bounds
+        self.paths = paths
+
+    @classmethod
+    def from_graph(cls, graph, directory, block_size=BLOCK_SIZE):
+        """
+        Write the links of a LinkGraph (which may be memory-mapped) to
+        blocks of about `block_size` links in `directory`, reading them
+        `block_size` at a time.
+        """
+        n = len(graph)
+        nLinks = len(graph.targets)
+
+        # page ranges of the source pages of each chunk of links read
+        chunks = numpy.searchsorted(
+            graph.offsets, numpy.arange(0, nLinks, block_size), side="right"
+        ) - 1
+        chunks = numpy.append(numpy.unique(chunks), n)
+
+        # split target pages into ranges with about block_size links each
+        indegree = numpy.zeros(n, dtype=numpy.int64)
+        for start, stop in zip(chunks[:-1], chunks[1:]):
+            targets = graph.targets[graph.offsets[start]:graph.offsets[stop]]
+            indegree += numpy.bincount(targets, minlength=n)
+        cumulative = numpy.cumsum(indegree)
+        bounds = numpy.searchsorted(
+            cumulative, numpy.arange(block_size, nLinks, block_size)
+        )
+        bounds = numpy.unique(
+            numpy.minimum(numpy.concatenate([[0], bounds + 1, [n]]), n)
+        )
+
+        paths = [os.path.join(directory, f"block{k}.edges")
+                 for k in range(len(bounds) - 1)]
+        files = [open(path, "wb") for path in paths]
+        try:
+            for start, stop in zip(chunks[:-1], chunks[1:]):
+                targets = numpy.asarray(
+                    graph.targets[graph.offsets[start]:graph.offsets[stop]]
+                )
+                sources = numpy.repeat(numpy.arange(start, stop),
+                                       graph.outdegree[start:stop])
+
+                # append each link to the block of its target page
+                blocks = numpy.searchsorted(bounds, targets, side="right") - 1
+                order = numpy.argsort(blocks, kind="stable")
+                pairs = numpy.column_stack([sources, targets])[order]
+                splits = numpy.searchsorted(blocks[order],
+                                            numpy.arange(1, len(files)))
+                for f, part in zip(files, numpy.split(pairs, splits)):
+                    f.write(part.astype("<i8").tobytes())
+        finally:
+            for f in files:
+                f.close()
+
+        return cls(graph.names, numpy.array(graph.outdegree), bounds, paths)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        """
+        Read the blocks in turn, yielding for each one the range of target
+        pages it covers and the sources and targets of its links.
+        """
+        for k, path in enumerate(self.paths):
+            pairs = numpy.fromfile(path, dtype="<i8").reshape(-1, 2)
+            yield self.bounds[k], self.bounds[k + 1], pairs[:, 0], pairs[:, 1]
+
+
+class LinkMatrix():
+    """
+    Sparse n x n matrix in compressed sparse row form, supporting only
+    multiplication by a dense vector or matrix, for use without SciPy.
+    """
+
+    def __init__(self, n, rows, columns, weights):
+        """Create a new matrix from the coordinates of its entries."""
+        order = numpy.argsort(rows, kind="stable")
+        self.shape = (n, n)
+        self.rows = numpy.asarray(rows)[order]
+        self.indices = numpy.asarray(columns)[order]
+        self.data = numpy.asarray(weights, dtype=numpy.float64)[order]
+        self.indptr = numpy.zeros(n + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(rows, minlength=n), out=self.indptr[1:])
+
+    def __matmul__(self, x):
+        # weight the entry of x picked by each column index, then sum each row
+        products = x[self.indices]
+        if x.ndim == 1:
+            return numpy.bincount(self.rows, weights=products * self.data,
+                                  minlength=self.shape[0])
+        products = products * self.data[:, numpy.newaxis]
+
+        # reduceat needs a valid start index for empty rows, so sum over
+        # a zero row appended at the end and clear empty rows afterwards
+        products = numpy.vstack([products, numpy.zeros((1, x.shape[1]))])
+        starts = numpy.minimum(self.indptr[:-1], len(self.indices))
+        result = numpy.add.reduceat(products, starts, axis=0)
+        result[self.indptr[:-1] == self.indptr[1:]] = 0
+        return result
@@ -1,53 +1,216 @@
 import os
-import random
 import re
 import sys
+import tempfile
+import time
 import numpy
-from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
+
+from linkgraph import BLOCK_SIZE, EdgeBlocks, LinkGraph
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# iteration stops once ranks change by less than this in total (L1 norm)
+TOLERANCE = 1e-6
+
+# iterations between Aitken extrapolation steps, when enabled
+EXTRAPOLATION_PERIOD = 10
+
+# pattern of a link in an HTML page
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# characters read from a page at a time when scanning for links, and
+# characters kept from the end of each chunk so links split between
+# two chunks are still found
+CHUNK_SIZE = 1 << 16
+CHUNK_OVERLAP = 1 << 12
+
+# suffix of the cached link graph file written next to a corpus directory
+GRAPH_SUFFIX = ".graph"
+
+# page name -> page index, in each crawler worker process
+pageIndex = dict()
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python pagerank.py corpus [processes]")
+    processes = int(sys.argv[2]) if len(sys.argv) == 3 else None
+    graph = load_graph(sys.argv[1], processes=processes)
+    ranks = sample_pagerank(graph, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    ranks = iterate_pagerank(graph, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
 
+class PageRankResult():
+    """
+    PageRank values of a LinkGraph, with diagnostics of the run that
+    computed them.
+    """
+
+    def __init__(self, names):
+        """Create a new, empty result for the pages `names`."""
+        self.names = names
+
+        # PageRank vector, indexed like names
+        self.ranks = None
+
+        # number of iterations, the total change of the ranks (L1 norm)
+        # made by each one, and whether the last change was below tolerance
+        self.iterations = 0
+        self.residuals = []
+        self.converged = False
+
+        # phase name -> seconds spent in it
+        self.timings = dict()
+
+    def as_dict(self):
+        """
+        Return a dictionary where keys are page names, and values are
+        their PageRank value.
+        """
+        return dict(zip(self.names, self.ranks.tolist()))
+
+
+def rank_corpus(directory, damping_factor=DAMPING, tolerance=TOLERANCE,
+                max_iterations=None, callback=None, extrapolate=False,
+                processes=None):
+    """
+    Return the PageRankResult of a corpus directory by power iteration
+    (see power_iteration for the options), crawling it with `processes`
+    processes if needed, and timing each phase of the run:
+    "crawl" loads or crawls the link graph, "build" builds its link matrix
+    and "iterate" computes the PageRank values.
+    """
+    start = time.perf_counter()
+    graph = load_graph(directory, processes=processes)
+    crawled = time.perf_counter()
+    graph.link_matrix()
+    built = time.perf_counter()
+    result = power_iteration(graph, damping_factor, tolerance,
+                             max_iterations=max_iterations,
+                             callback=callback, extrapolate=extrapolate)
+    result.timings = {
+        "crawl": crawled - start,
+        "build": built - crawled,
+        "iterate": time.perf_counter() - built,
+    }
+    return result
+
+
 def crawl(directory):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
     """
-    pages = dict()
+    return crawl_graph(directory).to_corpus()
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
-    return pages
+def crawl_graph(directory, processes=None):
+    """
+    Parse a directory of HTML pages into a LinkGraph, without holding
+    the pages in memory: each page is scanned for links in chunks, and
+    links are turned into page indices as soon as they are found.
+    If `processes` is more than 1, pages are scanned by a pool of processes.
+    """
+    names = sorted(
+        filename for filename in os.listdir(directory)
+        if filename.endswith(".html")
+    )
+    index = {name: p for p, name in enumerate(names)}
+    paths = [os.path.join(directory, name) for name in names]
+
+    if processes is not None and processes > 1:
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=set_page_index,
+                                 initargs=(index,)) as executor:
+            links = list(executor.map(scan_page, paths, chunksize=64))
+    else:
+        set_page_index(index)
+        links = [scan_page(path) for path in paths]
+
+    # edge list: page p links to every page in links[p]
+    sources = numpy.repeat(numpy.arange(len(names)),
+                           [len(pageLinks) for pageLinks in links])
+    targets = numpy.concatenate(links) if links else []
+    return LinkGraph.from_edges(names, sources, targets)
+
+
+def corpus_stamp(directory):
+    """
+    Return the latest modification time, in nanoseconds, of a corpus
+    directory and the HTML pages in it. Adding or removing a page changes
+    the time of the directory; editing a page changes the time of the page.
+    """
+    stamp = os.stat(directory).st_mtime_ns
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html"):
+                stamp = max(stamp, entry.stat().st_mtime_ns)
+    return stamp
+
+
+def load_graph(directory, cache=None, processes=None):
+    """
+    Return the LinkGraph of a corpus directory, loaded from the graph file
+    `cache` (by default the directory name followed by GRAPH_SUFFIX) if
+    nothing in the directory has changed since it was written. Otherwise
+    crawl the directory, with `processes` processes (see crawl_graph), and
+    write the graph file for the next run.
+    """
+    if cache is None:
+        cache = os.path.normpath(directory) + GRAPH_SUFFIX
+    stamp = corpus_stamp(directory)
+
+    if os.path.exists(cache):
+        graph = LinkGraph.load(cache, stamp)
+        if graph is not None:
+            return graph
+
+    graph = crawl_graph(directory, processes)
+    try:
+        graph.save(cache, stamp)
+    except OSError:
+        # ranking still works without the cache, e.g. on a read-only disk
+        pass
+    return graph
+
+
+def set_page_index(index):
+    """
+    Set the page name -> page index mapping used by scan_page.
+    """
+    global pageIndex
+    pageIndex = index
+
+
+def scan_page(path):
+    """
+    Return the sorted indices of the corpus pages linked to by the page
+    at `path`, reading it in chunks of CHUNK_SIZE characters.
+    """
+    links = set()
+    with open(path) as f:
+        carry = ""
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            text = carry + chunk
+            for link in LINK_PATTERN.findall(text):
+                if link in pageIndex:
+                    links.add(pageIndex[link])
+            if not chunk:
+                break
+
+            # links found again in the overlap are already in the set
+            carry = text[-CHUNK_OVERLAP:]
+    return numpy.array(sorted(links), dtype=numpy.int64)
 
 
 def transition_model(corpus, page, damping_factor):
@@ -82,7 +245,16 @@ def transition_model(corpus, page, damping_factor):
     return probDist
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def as_graph(corpus):
+    """
+    Return `corpus` as a LinkGraph, converting it if it is a dictionary.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)
+
+
+def sample_pagerank(corpus, damping_factor, n, seed=None, walkers=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -90,28 +262,58 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-    # initialize count dictionary
-    countDict = dict.fromkeys(corpus.keys(), 0)
 
-    # randomly choose a starting page
-    currPage = random.choice(list(corpus.keys()))
-    countDict[currPage] += 1
+    The samples are taken by `walkers` independent surfers moving at the
+    same time (by default one per 1000 samples, so each surfer takes
+    enough steps to forget its random starting page). `seed` makes the
+    samples reproducible. `corpus` may also be a LinkGraph.
+    """
+    graph = as_graph(corpus)
+    counts = surf(graph, damping_factor, n, seed, walkers)
+    return dict(zip(graph.names, (counts / n).tolist()))
 
-    # samples n - 1 cases using surfer method
-    for i in range(1, n):
-        probDist = transition_model(corpus, currPage, damping_factor)
-        # choose page randomly based on probability distribution
-        currPage = random.choices(list(probDist.keys()), weights=list(probDist.values()), k=1)[0]
-        countDict[currPage] += 1
 
-    prDict = {}
+def surf(graph, damping_factor, n, seed=None, walkers=None):
+    """
+    Return the number of times each page of a LinkGraph is visited
+    in `n` samples of random surfers following the transition model.
+    Each step moves every surfer at once, in constant time per surfer.
+    """
+    nPage = len(graph)
+    rng = numpy.random.default_rng(seed)
+    if walkers is None:
+        walkers = max(1, n // 1000)
+    walkers = min(walkers, n)
 
-    # calculate probability/pagerank
-    for count in countDict:
-        prDict[count] = countDict[count] / n
+    # randomly choose a starting page for each surfer
+    pages = rng.integers(nPage, size=walkers)
+    counts = numpy.zeros(nPage, dtype=numpy.int64)
+    samples = 0
 
-    return prDict
+    while True:
+        # count the page of each surfer, up to n samples in total
+        take = min(walkers, n - samples)
+        counts += numpy.bincount(pages[:take], minlength=nPage)
+        samples += take
+        if samples == n:
+            return counts
+
+        # with probability `damping_factor`, follow a random link of the
+        # current page, or jump to a random page if it has no links
+        follow = (rng.random(walkers) < damping_factor) \
+            & ~graph.dangling[pages]
+        choice = rng.random(walkers)
+        jump = rng.integers(nPage, size=walkers)
+
+        # only surfers following a link pick one, so dangling pages (and
+        # graphs with no links at all) never index into the links
+        followers = follow.nonzero()[0]
+        current = pages[followers]
+        link = graph.offsets[current] + (
+            choice[followers] * graph.outdegree[current]
+        ).astype(numpy.int64)
+        pages = jump
+        pages[followers] = graph.targets[link]
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -121,69 +323,298 @@ def iterate_pagerank(corpus, damping_factor):
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
-    PageRank values should sum to 1.
+    PageRank values should sum to 1. `corpus` may also be a LinkGraph.
     """
+    graph = as_graph(corpus)
+    return power_iteration(graph, damping_factor).as_dict()
 
-    nPage = len(corpus)
-    pageList = list(corpus.keys())
 
-    # initialize pagerank dictionary with equal probability
-    prDict = dict.fromkeys(pageList, 1 / nPage)
+def personalized_pagerank(corpus, damping_factor, teleports):
+    """
+    Return personalized PageRank values, where the random surfer jumps
+    to pages chosen from a given distribution instead of uniformly.
+
+    `teleports` is a dictionary where keys are names (e.g. a user or a
+    topic) and values are dictionaries mapping pages to the weight of
+    jumping to them; weights are scaled to sum to 1 and unlisted pages
+    get none. Surfers on pages with no links also jump by these weights.
+
+    Return a dictionary mapping each name of `teleports` to a dictionary
+    of PageRank values, computed for all names in one power iteration.
+    """
+    graph = as_graph(corpus)
+    index = {name: p for p, name in enumerate(graph.names)}
+
+    # teleport matrix: column k is the jump distribution of names[k]
+    names = list(teleports)
+    matrix = numpy.zeros((len(graph), len(names)))
+    for k, name in enumerate(names):
+        for page, weight in teleports[name].items():
+            matrix[index[page], k] = weight
+
+    ranks, iterations = blocked_power_iteration(graph, damping_factor, matrix)
+    return {
+        name: dict(zip(graph.names, ranks[:, k].tolist()))
+        for k, name in enumerate(names)
+    }
+
+
+def update_pagerank(corpus, ranks, changes, damping_factor):
+    """
+    Return PageRank values for a corpus after some of its pages changed,
+    starting from the PageRank values `ranks` of the corpus before the
+    change instead of from equal values, which takes far fewer iterations
+    when only a few pages changed.
+
+    `changes` is a dictionary where keys are added, removed or changed
+    pages, and values are the set of pages each one now links to, or None
+    if the page was removed.
+
+    Return a tuple (graph, ranks, iterations): the LinkGraph of the new
+    corpus, a dictionary of its PageRank values, and the number of
+    iterations taken.
+    """
+    graph = update_graph(as_graph(corpus), changes)
 
-    # make a look-up dictionary where key is page
-    # values are pages that points to key page
-    reverseDict = dict()
+    # pages kept from the old corpus start from their old rank, and new
+    # pages from the rank every page would have in a uniform start
+    start = numpy.array(
+        [ranks.get(name, 1 / len(graph)) for name in graph.names]
+    )
+    start /= start.sum()
 
-    # initialize look-up dictionary
-    for page in corpus:
-        reverseDict[page] = set()
+    result = power_iteration(graph, damping_factor, ranks=start)
+    return graph, result.as_dict(), result.iterations
 
-    # add entries to reverse look-up page
-    for parentPage in corpus:
-        # if page has no links, treat as if it contains link to all pages
-        if len(corpus[parentPage]) == 0:
-            for page in corpus:
-                reverseDict[page].add(parentPage)
 
+def update_graph(graph, changes):
+    """
+    Return a new LinkGraph with the links of the pages in `changes`
+    replaced (see update_pagerank), and links of unchanged pages to
+    removed pages dropped.
+    """
+    removed = set(name for name, links in changes.items() if links is None)
+    names = sorted(
+        (set(graph.names) - removed)
+        | set(name for name, links in changes.items() if links is not None)
+    )
+    index = {name: p for p, name in enumerate(names)}
+
+    # new index of every old page, or -1 if it was removed
+    renumber = numpy.array(
+        [index.get(name, -1) for name in graph.names], dtype=numpy.int64
+    )
+
+    # keep the links of unchanged pages that still exist at both ends
+    unchanged = numpy.array(
+        [name not in changes for name in graph.names], dtype=bool
+    )
+    oldSources = graph.sources()
+    keep = unchanged[oldSources] & (renumber[graph.targets] >= 0)
+    sources = [renumber[oldSources[keep]]]
+    targets = [renumber[graph.targets[keep]]]
+
+    # links of added and changed pages, to pages of the new corpus
+    for name, links in changes.items():
+        if links is None:
             continue
+        pageTargets = [index[link] for link in links if link in index]
+        sources.append(numpy.full(len(pageTargets), index[name]))
+        targets.append(numpy.array(pageTargets, dtype=numpy.int64))
 
-        for linkedPage in corpus[parentPage]:
-            reverseDict[linkedPage].add(parentPage)
+    return LinkGraph.from_edges(
+        names, numpy.concatenate(sources), numpy.concatenate(targets)
+    )
 
-    oldDict = deepcopy(prDict)
-    # calculate the probability of being chosen randomly from corpus
-    fromCorpus = (1 - damping_factor) / nPage
 
-    while True:
-        # loop through all pages in corpus to update probability
-        for page in pageList:
-            # probability of click from corpus
-            prDict[page] = fromCorpus
-
-            # loop through parent page that points to current page
-            # and update probability of click from parent page
-            for parentPage in reverseDict[page]:
-                # count number of links from parent
-                # if none, treat as if pointing to all pages in corpus
-                nLinks = len(corpus[parentPage])
-                if nLinks == 0:
-                    nLinks = nPage
-                # add probability of being chosen by clicks from a parent page
-                prDict[page] += damping_factor * oldDict[parentPage] / nLinks
-
-        # if all entries changes by less than 0.001, break out of loop
-        match = 0
-        for page in pageList:
-            if numpy.absolute(prDict[page] - oldDict[page]) < 0.001:
-                match += 1
-
-        if match == nPage:
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                    ranks=None, max_iterations=None, callback=None,
+                    extrapolate=False):
+    """
+    Return the PageRankResult of a LinkGraph by repeatedly applying the
+    PageRank formula to the whole PageRank vector:
+
+        PR = (1 - d) / N + d * (M @ PR + dangling rank / N)
+
+    where M is the column-stochastic link matrix. Pages with no links are
+    treated as linking to every page, which adds the same rank to every
+    page (a rank-one correction) instead of filling in M.
+
+    Iteration starts from `ranks` if given, otherwise from equal values,
+    and stops once the ranks change by less than `tolerance` in total, or
+    after `max_iterations` iterations. `callback`, if given, is called
+    after each iteration with the iteration number, the change made and
+    the new ranks. If `extrapolate` is True, every EXTRAPOLATION_PERIOD
+    iterations the ranks jump to the Aitken extrapolation of the last
+    three iterates, as long as doing so speeds up convergence.
+    """
+    nPage = len(graph)
+    matrix = graph.link_matrix()
+    result = PageRankResult(graph.names)
+
+    # initialize pagerank vector with equal probability
+    if ranks is None:
+        ranks = numpy.full(nPage, 1 / nPage)
+    iterates = []
+    fallback = None
+
+    while max_iterations is None or result.iterations < max_iterations:
+        danglingRank = ranks[graph.dangling].sum()
+        newRanks = (1 - damping_factor) / nPage \
+            + damping_factor * (matrix @ ranks + danglingRank / nPage)
+
+        residual = float(numpy.abs(newRanks - ranks).sum())
+        result.iterations += 1
+        result.residuals.append(residual)
+        if callback is not None:
+            callback(result.iterations, residual, newRanks)
+
+        # an extrapolation that slowed convergence is undone, and not tried
+        # again: the ranks do not converge along a single direction
+        if fallback is not None and residual > result.residuals[-2]:
+            newRanks = fallback
+            extrapolate = False
+        fallback = None
+        ranks = newRanks
+
+        # stop once total change across all pages is below tolerance
+        if residual < tolerance:
+            result.converged = True
             break
 
-        # if not converged yet, update oldDict to store old distribution
-        oldDict = deepcopy(prDict)
+        if extrapolate:
+            iterates = iterates[-2:] + [ranks]
+            if result.iterations % EXTRAPOLATION_PERIOD == 0 \
+                    and len(iterates) == 3:
+                fallback = ranks
+                ranks = aitken_extrapolation(*iterates)
+                iterates = []
+
+    result.ranks = ranks
+    return result
 
-    return prDict
+
+def aitken_extrapolation(first, second, third):
+    """
+    Return the Aitken extrapolation of three consecutive PageRank vectors,
+    estimating the limit of each page's rank from its last two changes,
+    as a probability distribution.
+    """
+    change = second - first
+    curvature = third - 2 * second + first
+
+    # pages whose changes did not shrink keep their latest rank
+    usable = numpy.abs(curvature) > 1e-15
+    ranks = third.copy()
+    ranks[usable] = first[usable] - change[usable] ** 2 / curvature[usable]
+    ranks = numpy.maximum(ranks, 0)
+    return ranks / ranks.sum()
+
+
+def out_of_core_pagerank(filename, damping_factor, tolerance=TOLERANCE,
+                         max_iterations=None, block_size=BLOCK_SIZE):
+    """
+    Return the PageRankResult of the graph in a graph file (see
+    LinkGraph.save), keeping only vectors with one value per page in
+    memory. The links are copied from the memory-mapped file to blocks
+    of `block_size` links in a temporary directory, which each iteration
+    reads one at a time.
+    """
+    graph = LinkGraph.load(filename)
+    with tempfile.TemporaryDirectory() as directory:
+        blocks = EdgeBlocks.from_graph(graph, directory, block_size)
+        return streaming_power_iteration(blocks, damping_factor, tolerance,
+                                         max_iterations)
+
+
+def streaming_power_iteration(blocks, damping_factor, tolerance=TOLERANCE,
+                              max_iterations=None):
+    """
+    Return the PageRankResult of a graph stored as EdgeBlocks, using the
+    same formula as power_iteration but adding up the rank passed along
+    each link one block at a time.
+    """
+    nPage = len(blocks)
+    result = PageRankResult(blocks.names)
+    linked = ~blocks.dangling
+
+    # initialize pagerank vector with equal probability
+    ranks = numpy.full(nPage, 1 / nPage)
+
+    while max_iterations is None or result.iterations < max_iterations:
+        # rank each page passes along each of its links
+        share = numpy.zeros(nPage)
+        numpy.divide(ranks, blocks.outdegree, out=share, where=linked)
+
+        danglingRank = ranks[blocks.dangling].sum()
+        newRanks = numpy.full(
+            nPage,
+            (1 - damping_factor) / nPage
+            + damping_factor * danglingRank / nPage
+        )
+        for start, stop, sources, targets in blocks:
+            newRanks[start:stop] += damping_factor * numpy.bincount(
+                targets - start, weights=share[sources], minlength=stop - start
+            )
+
+        residual = float(numpy.abs(newRanks - ranks).sum())
+        result.iterations += 1
+        result.residuals.append(residual)
+        ranks = newRanks
+
+        # stop once total change across all pages is below tolerance
+        if residual < tolerance:
+            result.converged = True
+            break
+
+    result.ranks = ranks
+    return result
+
+
+def blocked_power_iteration(graph, damping_factor, teleports,
+                            tolerance=TOLERANCE):
+    """
+    Return the personalized PageRank vectors of a LinkGraph, as the
+    columns of a matrix, and the number of iterations taken.
+    Column k of `teleports` (or `teleports` itself, if it is a vector) is
+    the distribution surfers jump to instead of following a link.
+    Iterating all columns together multiplies the link matrix by a dense
+    block once per iteration instead of by each vector in turn:
+
+        PR = (1 - d) * T + d * (M @ PR + T * dangling rank of PR)
+
+    Iteration stops once every column changes by less than `tolerance`.
+    """
+    teleports = numpy.array(teleports, dtype=numpy.float64)
+    if teleports.ndim == 1:
+        teleports = teleports[:, numpy.newaxis]
+    totals = teleports.sum(axis=0)
+    if len(graph) != teleports.shape[0] or (totals <= 0).any():
+        raise ValueError("teleport distributions must have positive weight "
+                         "and one row per page")
+    teleports /= totals
+    matrix = graph.link_matrix()
+
+    ranks = teleports.copy()
+    iterations = 0
+
+    while True:
+        iterations += 1
+
+        # update in place: the block is too large to copy several times
+        # per iteration, unlike a single vector
+        danglingRank = graph.dangling @ ranks
+        newRanks = matrix @ ranks
+        newRanks += teleports * (danglingRank + (1 - damping_factor)
+                                 / damping_factor)
+        newRanks *= damping_factor
+
+        # stop once the total change of each vector is below tolerance
+        numpy.subtract(ranks, newRanks, out=ranks)
+        numpy.abs(ranks, out=ranks)
+        if ranks.sum(axis=0).max() < tolerance:
+            return newRanks, iterations
+        ranks = newRanks
 
 
 if __name__ == "__main__":